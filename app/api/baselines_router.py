@@ -1,17 +1,40 @@
-from typing import List
+from typing import Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query
 
-from app.schema.baselines import BaseLinesOut
+from app.helpers.cache import response_cache, project_tag
+from app.schema.baselines import BaseLinesExpand, BaseLinesResponse
+from app.schema.version_diff import VersionDiffOut
 from app.services.beselines_services import BaseLinesService
 
 baselines_router = APIRouter()
 
 
-@baselines_router.get('/', response_model=List[BaseLinesOut])
-async def get_project_base_plans(project_id: int, service: BaseLinesService = Depends()):
+@baselines_router.get('/', response_model=BaseLinesResponse)
+async def get_project_base_plans(project_id: int, expand: BaseLinesExpand = BaseLinesExpand.full,
+                                 if_none_match: Optional[str] = Header(None), service: BaseLinesService = Depends()):
 
     """ Отдает все базовые планы по проекту
-        project_id - id проекта """
+        project_id - id проекта
+        expand - объем ответа: plans - только планы, versions - планы и версии,
+                 tasks - планы и версии с ключевыми датами, latest - планы и последняя версия,
+                 full - как tasks плюс ключевые даты плана
+        If-None-Match - ETag из прошлого ответа: 304, если проект с тех пор не менялся """
 
-    return await service.get_base_plans(project_id)
+    return await response_cache.get_or_set_conditional(
+        ('baselines', project_id, expand.value), [project_tag(project_id)], if_none_match,
+        lambda: service.get_etag(project_id, expand), lambda: service.get_base_plans_rows(project_id, expand))
+
+
+@baselines_router.get('/{base_plan_id}/diff', response_model=VersionDiffOut)
+async def get_versions_diff(base_plan_id: int, from_version_id: Optional[int] = Query(None, alias='from'),
+                            to_version_id: Optional[int] = Query(None, alias='to'),
+                            service: BaseLinesService = Depends()):
+
+    """ Отличия ключевых дат между двумя версиями базового плана: добавленные, удаленные
+        и сдвинутые таски с разницей в днях
+        base_plan_id - id базового плана
+        from - id версии, с которой сравнивать; по умолчанию сам базовый план (корневая версия)
+        to - id сравниваемой версии; по умолчанию текущая версия плана """
+
+    return await service.get_versions_diff(base_plan_id, from_version_id, to_version_id)
@@ -0,0 +1,50 @@
+from http import HTTPStatus
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_migration_session
+from app.helpers.exception import BaseException, ErrorCode
+from app.schema.export import ExportFormat, KeyDatesExportFilter, EXPORT_MEDIA_TYPES
+from app.schema.snapshot import SnapshotFormat, SnapshotOut
+from app.services.export_services import ExportService
+from app.services.snapshot_services import write_snapshot, snapshot_settings
+
+export_router = APIRouter()
+
+
+@export_router.get('/key_dates', response_class=StreamingResponse)
+async def export_key_dates(export_format: ExportFormat = Query(ExportFormat.ndjson, alias='format'),
+                           filters: KeyDatesExportFilter = Depends(), service: ExportService = Depends()):
+
+    """ Выгрузка ключевых дат с версией, базовым планом и проектом потоком,
+        без сборки всего ответа в памяти
+        format - ndjson (строка JSON на ключевую дату) или csv
+        строки дельта-версий (is_delta) - только изменения к parent_version_id, удаленные таски с is_removed
+        project_id - только этот проект
+        migration_date_from, migration_date_to - даты миграции версий, включительно """
+
+    return StreamingResponse(
+        service.export_key_dates(filters, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={'Content-Disposition': f'attachment; filename="key_dates.{export_format.value}"'},
+    )
+
+
+@export_router.post('/snapshot', response_model=SnapshotOut)
+async def create_snapshot(snapshot_format: Optional[SnapshotFormat] = Query(None, alias='format'),
+                          current_only: Optional[bool] = None,
+                          session: AsyncSession = Depends(get_migration_session)):
+
+    """ Снимок таблиц project, base_plan, version, key_dates в Parquet или Arrow IPC
+        в каталог SNAPSHOT_DIRECTORY, по файлу на таблицу
+        format - parquet или arrow; по умолчанию из настроек
+        current_only - только текущие версии и их ключевые даты; по умолчанию из настроек """
+
+    if not snapshot_settings.directory:
+        raise BaseException(HTTPStatus.SERVICE_UNAVAILABLE, ErrorCode.SNAPSHOT_NOT_CONFIGURED)
+    return await write_snapshot(
+        session, snapshot_settings.directory, snapshot_format or snapshot_settings.format,
+        snapshot_settings.current_only if current_only is None else current_only)
@@ -1,6 +1,9 @@
+from typing import List
+
 from fastapi import APIRouter
 
-from app.services.healthcheck_services import check_service
+from app.schema.healthcheck import PoolStatus
+from app.services.healthcheck_services import check_service, get_pools_status
 
 healthcheck_router = APIRouter()
 
@@ -9,3 +12,9 @@ healthcheck_router = APIRouter()
 async def get_healthcheck():
     """ healthcheck """
     return await check_service()
+
+
+@healthcheck_router.get('/pools', response_model=List[PoolStatus])
+async def get_pools():
+    """ Метрики пулов соединений: занятые соединения, overflow, ожидание свободного соединения """
+    return await get_pools_status()
@@ -1,13 +1,31 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_async_session
-from app.services.migration_services import migrate_data
+from http import HTTPStatus
+from uuid import UUID
+
+from fastapi import APIRouter
+
+from app.schema.migration import MigrationParams, MigrationJobOut
+from app.services.migration_jobs import migration_jobs
 
 migration_router = APIRouter()
 
 
-@migration_router.get('/')
-async def start_migration(session: AsyncSession = Depends(get_async_session)) -> True:
-    """ Миграция данных из MS SQL"""
+@migration_router.get('/', response_model=MigrationJobOut, status_code=HTTPStatus.ACCEPTED, deprecated=True)
+async def start_migration():
+    """ Устаревший запуск миграции: ставит миграцию с параметрами по умолчанию в фоновую задачу,
+        как POST /migrate/, и сразу отдает ее; ход миграции - GET /migrate/{job_id} """
+
+    return migration_jobs.start(MigrationParams()).to_schema()
+
+
+@migration_router.post('/', response_model=MigrationJobOut, status_code=HTTPStatus.ACCEPTED)
+async def create_migration_job(params: MigrationParams = MigrationParams()):
+    """ Ставит миграцию в фоновую задачу и сразу отдает ее id """
+
+    return migration_jobs.start(params).to_schema()
+
+
+@migration_router.get('/{job_id}', response_model=MigrationJobOut)
+async def get_migration_job(job_id: UUID):
+    """ Состояние фоновой миграции: проекты обработано/всего, записано строк, скорость """
 
-    return await migrate_data(session)
+    return migration_jobs.get(job_id).to_schema()
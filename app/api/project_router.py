@@ -1,17 +1,41 @@
-from typing import List
+from typing import Optional, List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Header
 
-from app.schema.project import ProjectBase
+from app.helpers.cache import response_cache, PROJECTS_TAG, project_tag
+from app.schema.base import PaginationParams
+from app.schema.key_dates import KeyDatesBase
+from app.schema.project import ProjectFilter, ProjectPage
 from app.services.project_services import ProjectService
 
 project_router = APIRouter()
 
 
-@project_router.get('/', response_model=List[ProjectBase])
-async def get_projects(service: ProjectService = Depends()):
+@project_router.get('/', response_model=ProjectPage)
+async def get_projects(filters: ProjectFilter = Depends(), pagination: PaginationParams = Depends(),
+                       after_id: Optional[int] = Query(None, ge=0), if_none_match: Optional[str] = Header(None),
+                       service: ProjectService = Depends()):
 
-    """ Отдает все проекты   """
+    """ Отдает проекты постранично
+        after_id - id последнего проекта предыдущей страницы (next_after_id из ответа);
+        без него страница выбирается по page
+        is_active, date_from, date_to, name - фильтры
+        If-None-Match - ETag из прошлого ответа: 304, если проекты с тех пор не менялись """
 
-    return await service.get_projects()
+    key = ('projects', tuple(sorted(filters.dict().items())), tuple(sorted(pagination.dict().items())), after_id)
+    return await response_cache.get_or_set_conditional(
+        key, [PROJECTS_TAG], if_none_match, lambda: service.get_etag(filters, pagination, after_id),
+        lambda: service.get_projects_page(filters, pagination, after_id))
 
+
+@project_router.get('/{project_id}/key_dates', response_model=List[KeyDatesBase])
+async def get_project_current_key_dates(project_id: int, if_none_match: Optional[str] = Header(None),
+                                        service: ProjectService = Depends()):
+
+    """ Отдает ключевые даты последней версии проекта
+        project_id - id проекта
+        If-None-Match - ETag из прошлого ответа: 304, если проект с тех пор не менялся """
+
+    return await response_cache.get_or_set_conditional(
+        ('key_dates', project_id), [project_tag(project_id)], if_none_match,
+        lambda: service.get_key_dates_etag(project_id), lambda: service.get_current_key_dates(project_id))
@@ -1,17 +1,112 @@
+from enum import Enum
+from itertools import cycle
 from logging import getLogger
-from typing import Mapping
+from time import perf_counter, monotonic
+from typing import Mapping, Optional, List
 from uuid import uuid4
 
 from asyncpg import Connection
+from pydantic import BaseSettings
+from sqlalchemy import exc
 from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from app.helpers.instrumentation import instrumentation_settings, instrument_engine
 from app.settings import db_settings, server_settings
 
 log = getLogger()
 
 
+class PoolSettings(BaseSettings):
+    """
+    Пул соединений API чтения.
+    pool_timeout - сколько секунд запрос ждет свободное соединение, прежде чем упасть;
+    pool_recycle - соединения старше стольких секунд пересоздаются (-1 - никогда);
+    pool_pre_ping - проверять соединение перед выдачей из пула
+    """
+
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+
+    class Config:
+        env_prefix = 'db_pool_'
+
+    @property
+    def capacity(self) -> int:
+        return self.pool_size + self.max_overflow
+
+
+class MigrationPoolSettings(PoolSettings):
+    """
+    Пул соединений миграции. Параллельной миграции нужно по соединению
+    на каждый одновременно мигрируемый проект плюс соединение запроса.
+    """
+
+    class Config:
+        env_prefix = 'db_migration_pool_'
+
+
+pool_settings = PoolSettings()
+migration_pool_settings = MigrationPoolSettings()
+
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    """
+    Пул, который считает ожидание свободного соединения:
+    число выдач, суммарное и максимальное время ожидания, таймауты
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            wait_time = perf_counter() - started
+            self.checkouts += 1
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+
+
+class StatementCacheMode(str, Enum):
+    server = 'server'        # прямое подключение к Postgres: кэш prepared statements asyncpg как есть
+    unique = 'unique'        # PgBouncer без поддержки prepared statements: кэш выключен, имена уникальны
+    pgbouncer = 'pgbouncer'  # PgBouncer >= 1.21 с max_prepared_statements: кэш включен, имена по соединению
+
+
+class StatementCacheSettings(BaseSettings):
+    """
+    Кэш prepared statements.
+    statement_cache_mode - если не задан, выбирается по db_settings.statement_cache_size (0 - unique);
+    prepared_cache_size - размер кэша на соединение в режиме pgbouncer;
+    query_cache_size - кэш скомпилированного SQL в SQLAlchemy, общий для engine
+    """
+
+    statement_cache_mode: Optional[StatementCacheMode] = None
+    prepared_cache_size: int = 100
+    query_cache_size: int = 500
+
+    class Config:
+        env_prefix = 'db_'
+
+
+statement_cache_settings = StatementCacheSettings()
+
+
 class UniqueStmtConnection(Connection):
     """
     Connection class where uniq_id really unique.
@@ -21,47 +116,131 @@ class UniqueStmtConnection(Connection):
         return f"__asyncpg_{prefix}_{uuid4()}__"
 
 
-def build_connect_args(settings) -> Mapping:
-    connect_args = {}
+def get_statement_cache_mode(settings, cache: StatementCacheSettings = statement_cache_settings
+                             ) -> StatementCacheMode:
+    if cache.statement_cache_mode is not None:
+        return cache.statement_cache_mode
     if settings.statement_cache_size == 0:
+        return StatementCacheMode.unique
+    return StatementCacheMode.server
+
+
+def build_connect_args(settings, mode: Optional[StatementCacheMode] = None,
+                       cache: StatementCacheSettings = statement_cache_settings) -> Mapping:
+    """
+    В режиме pgbouncer PgBouncer (начиная с 1.21, max_prepared_statements > 0) сам отслеживает
+    протокольные Parse/Bind и готовит statement на том серверном соединении, куда попала транзакция.
+    Поэтому кэш asyncpg и SQLAlchemy остается включенным, а имена statements - обычные
+    для asyncpg, уникальные в пределах клиентского соединения.
+    При изменении схемы БД кэш сбрасывается самим адаптером SQLAlchemy по InvalidCachedStatementError
+    """
+
+    mode = mode or get_statement_cache_mode(settings, cache)
+    connect_args = {}
+    if mode == StatementCacheMode.unique:
         connect_args = {
-            "statement_cache_size": settings.statement_cache_size,
-            "prepared_statement_cache_size": settings.statement_cache_size,
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
             "connection_class": UniqueStmtConnection,
         }
+    elif mode == StatementCacheMode.pgbouncer:
+        connect_args = {
+            "statement_cache_size": cache.prepared_cache_size,
+            "prepared_statement_cache_size": cache.prepared_cache_size,
+        }
     return connect_args
 
 
-def _get_engine(settings, debug: bool = False) -> Engine:
+class ReplicaRouting(str, Enum):
+    round_robin = 'round_robin'              # реплики по очереди
+    least_connections = 'least_connections'  # реплика с наименьшим числом выданных соединений
+
+
+class ReplicaSettings(BaseSettings):
+    """
+    Реплики для запросов чтения API. Запись и миграция всегда идут на primary.
+    read_replica_dsns - JSON-список DSN, пустой - читать с primary;
+    read_your_writes_seconds - столько секунд после коммита миграции чтения идут на primary,
+    пока реплики догоняют (0 - выключено). Без этого кэш ответов может заполниться
+    данными отстающей реплики сразу после инвалидации
+    """
+
+    read_replica_dsns: List[str] = []
+    replica_routing: ReplicaRouting = ReplicaRouting.round_robin
+    read_your_writes_seconds: float = 0
+
+    class Config:
+        env_prefix = 'db_'
+
+
+replica_settings = ReplicaSettings()
+
+
+class ReadRouter:
+    """ Выбор engine для сессии чтения """
+
+    def __init__(self, primary, replicas: List, routing: ReplicaRouting = ReplicaRouting.round_robin,
+                 read_your_writes_seconds: float = 0):
+        self.primary = primary
+        self.replicas = replicas
+        self.routing = routing
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self.primary_until = 0.0
+        self._round_robin = cycle(replicas)
+
+    def mark_write(self) -> None:
+        """ Вызывается после коммита записи: включает окно read-your-writes """
+        if self.read_your_writes_seconds:
+            self.primary_until = monotonic() + self.read_your_writes_seconds
+
+    def pick(self):
+        if not self.replicas or monotonic() < self.primary_until:
+            return self.primary
+        if self.routing == ReplicaRouting.least_connections:
+            return min(self.replicas, key=lambda engine: engine.sync_engine.pool.checkedout())
+        return next(self._round_robin)
+
+
+def _get_engine(settings, debug: bool = False, pool: PoolSettings = pool_settings,
+                dsn: Optional[str] = None) -> Engine:
     """
     Retrieve database engine.
+    dsn - вместо settings.dsn (реплика)
     """
 
-    return create_async_engine(
-        settings.dsn,
+    engine = create_async_engine(
+        dsn or settings.dsn,
         echo=debug,
         connect_args=build_connect_args(settings),
+        query_cache_size=statement_cache_settings.query_cache_size,
+        poolclass=MeteredPool,
+        pool_size=pool.pool_size,
+        max_overflow=pool.max_overflow,
+        pool_timeout=pool.pool_timeout,
+        pool_recycle=pool.pool_recycle,
+        pool_pre_ping=pool.pool_pre_ping,
     )
+    if instrumentation_settings.enabled:
+        instrument_engine(engine)
+    return engine
 
 
-def _get_async_session(settings, debug: bool = False):
+def _get_async_session(settings, debug: bool = False, pool: PoolSettings = pool_settings):
     """
     Retrieves db session object.
     """
 
-    engine = _get_engine(settings, debug)
+    engine = _get_engine(settings, debug, pool)
     return sessionmaker(
         bind=engine, class_=AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False
     )
 
 
-def get_db_session_dependence(settings, debug: bool = False):
+def get_db_session_dependence(async_session):
     """
     Func which u can use in Depends()
     """
 
-    async_session = _get_async_session(settings, debug)
-
     async def get_db_session() -> AsyncSession:
         """
         Create new db session and guarantees that it will be closed.
@@ -72,5 +251,39 @@ def get_db_session_dependence(settings, debug: bool = False):
     return get_db_session
 
 
-get_async_session = get_db_session_dependence(db_settings, server_settings.debug)
+def get_read_session_dependence(async_session, router: ReadRouter):
+    """
+    Func which u can use in Depends(): session for read-only queries, bound to an engine chosen by router
+    """
+
+    async def get_read_session() -> AsyncSession:
+        async with async_session(bind=router.pick()) as db:
+            yield db
+
+    return get_read_session
+
+
+# отдельные пулы: всплеск запросов чтения не отнимает соединения у миграции и наоборот
+async_session = _get_async_session(db_settings, server_settings.debug)
+get_async_session = get_db_session_dependence(async_session)
+
+# фабрика сессий миграции, в том числе для работы вне запроса (фоновые задачи)
+migration_session = _get_async_session(db_settings, server_settings.debug, migration_pool_settings)
+get_migration_session = get_db_session_dependence(migration_session)
+
+# сессии запросов чтения: реплики, а без них или в окне read-your-writes - primary
+read_router = ReadRouter(
+    async_session.kw['bind'],
+    [_get_engine(db_settings, server_settings.debug, pool_settings, dsn) for dsn in replica_settings.read_replica_dsns],
+    replica_settings.replica_routing,
+    replica_settings.read_your_writes_seconds,
+)
+get_read_session = get_read_session_dependence(async_session, read_router)
+
+# пулы по назначению - для метрик
+pools = {
+    'api': (async_session.kw['bind'], pool_settings),
+    'migration': (migration_session.kw['bind'], migration_pool_settings),
+    **{f'replica_{i}': (engine, pool_settings) for i, engine in enumerate(read_router.replicas)},
+}
 
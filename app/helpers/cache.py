@@ -0,0 +1,167 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from time import monotonic
+from typing import Optional, Iterable, Callable, Awaitable, Dict, Set, Hashable, NamedTuple, Tuple
+
+from fastapi.responses import Response
+from pydantic import BaseSettings
+
+from app.helpers.etag import conditional_response
+from app.helpers.serialization import dumps
+
+PROJECTS_TAG = 'projects'
+
+
+def project_tag(project_id: int) -> str:
+    return f'project:{project_id}'
+
+
+class CacheSettings(BaseSettings):
+    """ Кэш ответов чтения; встроенный backend - в памяти процесса, см. LRUCacheBackend """
+
+    enabled: bool = True
+    ttl: float = 300
+    max_entries: int = 1024
+    max_bytes: int = 64 * 1024 * 1024
+
+    class Config:
+        env_prefix = 'response_cache_'
+
+
+class CachedResponse(NamedTuple):
+    content: bytes
+    etag: Optional[str] = None
+
+
+class CacheBackend(ABC):
+    """ Хранилище готовых JSON-ответов с тегами для инвалидации """
+
+    @abstractmethod
+    async def get(self, key: Hashable) -> Optional[CachedResponse]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: Hashable, value: CachedResponse, tags: Iterable[str]) -> None:
+        ...
+
+    @abstractmethod
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        ...
+
+
+class LRUCacheBackend(CacheBackend):
+    """
+    In-process LRU с TTL, ограниченный числом записей и суммарным размером.
+    Кэш свой у каждого процесса, и инвалидация после миграции сбрасывает только кэш процесса,
+    в котором прошла миграция: при нескольких воркерах остальные отдают старые ответы до TTL.
+    С несколькими воркерами кэш нужно выключить (RESPONSE_CACHE_ENABLED=false)
+    или подключить общий backend
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: Dict[Hashable, tuple] = OrderedDict()
+        self.tags: Dict[str, Set[Hashable]] = {}
+
+    def _pop(self, key: Hashable) -> None:
+        expires_at, value, tags = self.entries.pop(key)
+        self.size -= len(value.content)
+        for tag in tags:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+    async def get(self, key: Hashable) -> Optional[CachedResponse]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < monotonic():
+            self._pop(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: Hashable, value: CachedResponse, tags: Iterable[str]) -> None:
+        if len(value.content) > self.max_bytes:
+            return
+        if key in self.entries:
+            self._pop(key)
+        tags = tuple(tags)
+        self.entries[key] = (monotonic() + self.ttl, value, tags)
+        self.size += len(value.content)
+        for tag in tags:
+            self.tags.setdefault(tag, set()).add(key)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            self._pop(next(iter(self.entries)))
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            for key in list(self.tags.get(tag, ())):
+                self._pop(key)
+
+
+class ResponseCache:
+    """ Read-through кэш ответов эндпоинтов: хранит сериализованный JSON, а не ORM-объекты """
+
+    def __init__(self, backend: CacheBackend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        # счетчик сбросов по тегу: ответ, начатый до сброса, не кладется в кэш
+        self.generations: Dict[str, int] = {}
+
+    def _generations(self, tags: Tuple[str, ...]) -> Tuple[int, ...]:
+        return tuple(self.generations.get(tag, 0) for tag in tags)
+
+    async def _build(self, key: Hashable, tags: Tuple[str, ...], factory: Callable[[], Awaitable],
+                     etag: Optional[str], generations: Tuple[int, ...]) -> CachedResponse:
+        """
+        Строит ответ и кладет его в кэш, если за время построения теги не сбрасывались:
+        иначе ответ мог быть прочитан до коммита миграции и до TTL отдавался бы устаревшим
+        """
+
+        cached = CachedResponse(dumps(await factory()), etag)
+        if self.enabled and self._generations(tags) == generations:
+            await self.backend.set(key, cached, tags)
+        return cached
+
+    async def get_or_set_conditional(self, key: Hashable, tags: Iterable[str], if_none_match: Optional[str],
+                                     etag_factory: Callable[[], Awaitable[str]],
+                                     factory: Callable[[], Awaitable]) -> Response:
+        """
+        Ответ с ETag: ETag хранится вместе с ответом и сбрасывается теми же тегами,
+        поэтому при попадании в кэш запрос не ходит в БД ни за ответом, ни за ETag;
+        при промахе ETag считается до построения ответа
+        """
+
+        tags = tuple(tags)
+        generations = self._generations(tags)
+        cached = await self.backend.get(key) if self.enabled else None
+        etag = cached.etag if cached is not None and cached.etag else await etag_factory()
+
+        async def build() -> Response:
+            response = cached if cached is not None else await self._build(key, tags, factory, etag, generations)
+            return Response(content=response.content, media_type='application/json')
+
+        return await conditional_response(etag, if_none_match, build)
+
+    async def invalidate_projects(self, project_ids: Iterable[int]) -> None:
+        """ Сброс после коммита миграции: ответы по проектам и все страницы списка проектов """
+
+        project_ids = list(project_ids)
+        if project_ids:
+            tags = [PROJECTS_TAG, *map(project_tag, project_ids)]
+            for tag in tags:
+                self.generations[tag] = self.generations.get(tag, 0) + 1
+            await self.backend.invalidate(tags)
+
+
+cache_settings = CacheSettings()
+response_cache = ResponseCache(
+    LRUCacheBackend(cache_settings.ttl, cache_settings.max_entries, cache_settings.max_bytes),
+    cache_settings.enabled,
+)
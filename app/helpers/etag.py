@@ -0,0 +1,38 @@
+from hashlib import md5
+from http import HTTPStatus
+from typing import Optional, Callable, Awaitable
+
+from fastapi.responses import Response
+
+
+def make_etag(*parts) -> str:
+    """ Сильный ETag от отметки состояния данных и параметров запроса """
+
+    return '"%s"' % md5('|'.join(map(str, parts)).encode()).hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """ If-None-Match сравнивается слабо (RFC 7232): префикс W/ не учитывается """
+
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+async def conditional_response(etag: str, if_none_match: Optional[str],
+                               build: Callable[[], Awaitable[Response]]) -> Response:
+    """ 304 без тела, если у клиента актуальная версия, иначе ответ build() с заголовком ETag """
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers={'ETag': etag})
+    response = await build()
+    response.headers['ETag'] = etag
+    return response
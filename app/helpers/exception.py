@@ -15,6 +15,14 @@ class ErrorCode(Enum):
 
     NOT_FOUND_API = Error(404, 'Not Found')
 
+    MIGRATION_IN_PROGRESS = Error(409, 'Migration is already running')
+
+    MIGRATION_JOB_NOT_FOUND = Error(404, 'Migration job not found')
+
+    VERSION_NOT_FOUND = Error(404, 'Version not found in base plan')
+
+    SNAPSHOT_NOT_CONFIGURED = Error(503, 'Snapshot directory is not configured')
+
 
 class BaseException(Exception):
 
@@ -0,0 +1,156 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging import getLogger
+from time import perf_counter
+from typing import Optional, Iterator, List
+
+from pydantic import BaseSettings
+from sqlalchemy import event
+
+log = getLogger()
+
+# сколько символов медленнейшего запроса попадает в лог
+STATEMENT_LOG_LENGTH = 300
+
+
+class InstrumentationSettings(BaseSettings):
+    """
+    Учет SQL-запросов по HTTP-запросам.
+    query_budget - больше запросов к БД на один GET-запрос считается N+1 и пишется в лог предупреждением
+    (0 - без проверки);
+    budget_exempt_prefixes - пути, которые не проверяются: миграция заведомо делает много запросов;
+    log_requests - писать сводку по каждому запросу
+    """
+
+    enabled: bool = True
+    query_budget: int = 50
+    budget_exempt_prefixes: List[str] = ['/api/grp_reporter/migrate']
+    log_requests: bool = False
+
+    class Config:
+        env_prefix = 'sql_instrumentation_'
+
+
+instrumentation_settings = InstrumentationSettings()
+
+
+class QueryStats:
+    """ Запросы к БД, время в БД и на сериализацию в рамках одного HTTP-запроса или задачи """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.serialization_time = 0.0
+
+    def add_query(self, statement: str, seconds: float) -> None:
+        self.queries += 1
+        self.db_time += seconds
+        if seconds > self.slowest_time:
+            self.slowest_time = seconds
+            self.slowest_statement = statement
+
+    def summary(self) -> str:
+        statement = ' '.join((self.slowest_statement or '').split())[:STATEMENT_LOG_LENGTH]
+        return (f'{self.queries} queries, db {self.db_time * 1e3:.1f} ms, '
+                f'slowest {self.slowest_time * 1e3:.1f} ms: {statement}')
+
+
+# задачи asyncio и greenlet-ы SQLAlchemy наследуют контекст, поэтому события engine
+# пишут в статистику запроса, внутри которого выполняются
+current_stats: ContextVar[Optional[QueryStats]] = ContextVar('current_stats', default=None)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    stats = QueryStats()
+    token = current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_stats.reset(token)
+
+
+def record_serialization(seconds: float) -> None:
+    stats = current_stats.get()
+    if stats is not None:
+        stats.serialization_time += seconds
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault('query_started', []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info['query_started'].pop()
+    stats = current_stats.get()
+    if stats is not None:
+        stats.add_query(statement, perf_counter() - started)
+
+
+def _handle_error(exception_context) -> None:
+    # после ошибки after_cursor_execute не вызывается - снимаем отметку начала
+    started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine) -> None:
+    """ События engine: время каждого запроса к БД пишется в статистику текущего запроса """
+
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(sync_engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(sync_engine, 'handle_error', _handle_error)
+
+
+def server_timing(stats: QueryStats, total: float) -> str:
+    return ', '.join((
+        f'db;dur={stats.db_time * 1e3:.2f};desc="{stats.queries} queries"',
+        f'db-slowest;dur={stats.slowest_time * 1e3:.2f}',
+        f'serialize;dur={stats.serialization_time * 1e3:.2f}',
+        f'total;dur={total * 1e3:.2f}',
+    ))
+
+
+class QueryInstrumentationMiddleware:
+    """
+    ASGI middleware: запросы к БД и время по каждому HTTP-запросу в заголовке Server-Timing и в логе.
+    Заголовок пишется вместе с началом ответа, поэтому у потоковых ответов (выгрузка)
+    в нем только запросы до первого байта; в лог попадает итог после отправки тела
+    """
+
+    def __init__(self, app, settings: InstrumentationSettings = instrumentation_settings):
+        self.app = app
+        self.settings = settings
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = perf_counter()
+
+        async def send_with_timing(message) -> None:
+            if message['type'] == 'http.response.start':
+                header = server_timing(stats, perf_counter() - started)
+                message['headers'] = [*message.get('headers', []), (b'server-timing', header.encode())]
+            await send(message)
+
+        with track_queries() as stats:
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                self.report(scope, stats, perf_counter() - started)
+
+    def report(self, scope, stats: QueryStats, total: float) -> None:
+        path = scope.get('path')
+        budget = self.settings.query_budget
+        exempt = path is not None and path.startswith(tuple(self.settings.budget_exempt_prefixes))
+        if budget and not exempt and scope.get('method') == 'GET' and stats.queries > budget:
+            log.warning('query budget exceeded (%s > %s) %s %s in %.1f ms: %s',
+                        stats.queries, budget, scope.get('method'), path, total * 1e3, stats.summary())
+        elif self.settings.log_requests:
+            log.info('%s %s in %.1f ms, serialize %.1f ms: %s', scope.get('method'), path, total * 1e3,
+                     stats.serialization_time * 1e3, stats.summary())
@@ -0,0 +1,27 @@
+import json
+from time import perf_counter
+
+from fastapi.encoders import jsonable_encoder
+
+from app.helpers.instrumentation import record_serialization
+
+try:
+    import orjson
+except ImportError:  # без orjson ответы пишет стандартный json
+    orjson = None
+
+
+def dumps(content) -> bytes:
+    """
+    JSON ответа в байты.
+    orjson сам пишет dict, list, date, datetime, UUID и Enum;
+    остальное (pydantic-модели) приводится через jsonable_encoder
+    """
+
+    started = perf_counter()
+    if orjson is not None:
+        body = orjson.dumps(content, default=jsonable_encoder)
+    else:
+        body = json.dumps(content, default=jsonable_encoder, ensure_ascii=False).encode()
+    record_serialization(perf_counter() - started)
+    return body
@@ -1,12 +1,13 @@
 from http import HTTPStatus
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from app import router
 from app.helpers.exception import BaseException, ErrorCode
+from app.helpers.instrumentation import QueryInstrumentationMiddleware, instrumentation_settings
 from app.schema.response import ErrorResponse
 
 tags_metadata = [
@@ -26,6 +27,10 @@ tags_metadata = [
         'name': 'project data',
         'description': 'Проекты'
     },
+    {
+        'name': 'export data',
+        'description': 'Потоковая выгрузка данных'
+    },
 ]
 
 # add OpenAPI
@@ -54,14 +59,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# запросы к БД и время по каждому HTTP-запросу: Server-Timing, лог, бюджет запросов
+if instrumentation_settings.enabled:
+    app.add_middleware(QueryInstrumentationMiddleware)
+
 
 @app.exception_handler(BaseException)
-async def handle_base_exception(exception: BaseException) -> JSONResponse:
+async def handle_base_exception(request: Request, exception: BaseException) -> JSONResponse:
     """
     BaseException Handler
     """
 
-    error_code = exception.get_error_code().value
+    error_code = exception.get_error_code()
     error_response = ErrorResponse(
         code=error_code.code,
         message=error_code.message
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import (Column, Integer, String, Boolean, DateTime, ForeignKey)
+from sqlalchemy import (Column, Integer, String, Boolean, DateTime, ForeignKey, Index, UniqueConstraint, false)
 from sqlalchemy.dialects.mssql import DATETIME, INTEGER, CHAR
 from sqlalchemy.dialects.mysql import NVARCHAR
 from sqlalchemy.dialects.postgresql import UUID
@@ -9,6 +9,11 @@ from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
+# MD_PROP_UID кастомного поля "Ключевые даты"
+KEY_DATE_FIELD_UID = '674EB4DD-ECB7-E811-A2C3-005056ABC6E7'
+# LCID перевода значений справочника: значение хранится по строке на каждый язык
+KEY_DATE_LCID = 1049
+
 
 class MspProjects(Base):
     """  Проекты """
@@ -63,7 +68,7 @@ class MspTasks(Base):
     custom_plan = relationship('MspTaskCustomFieldsValues',
                                primaryjoin="and_(foreign(MspTaskCustomFieldsValues.task_uid)==MspTasks.task_uid, "
                                            "MspTaskCustomFieldsValues.md_prop_uid == "
-                                           f"'674EB4DD-ECB7-E811-A2C3-005056ABC6E7')",
+                                           f"'{KEY_DATE_FIELD_UID}')",
                                uselist=False, overlaps="custom_plans", lazy='joined')
 
     base_plan = relationship('MspTaskBaselines',
@@ -71,14 +76,14 @@ class MspTasks(Base):
                              uselist=False)
 
     @property
-    async def key_date(self):
+    def key_date(self):
         if self.custom_plan and self.custom_plan.key_dates:
             return self.custom_plan.key_dates.lt_value_text
         else:
             return None
 
     @classmethod
-    async def _get_map(cls):
+    def _get_map(cls):
         return {
             "task_start_date": "task_start_date",
             "task_finish_date": "task_finish_date",
@@ -89,8 +94,7 @@ class MspTasks(Base):
         }
 
     async def map(self, _src_attr):
-        _dst_attr = await self._get_map()
-        dst_attr = _dst_attr.get(_src_attr)
+        dst_attr = self._get_map().get(_src_attr)
         if dst_attr:
             return dst_attr, getattr(self, _src_attr)
 
@@ -116,8 +120,8 @@ class MspTaskCustomFieldsValues(Base):
                                  primaryjoin='foreign(MspCustomFields.md_prop_uid)==MspTaskCustomFieldsValues'
                                              '.md_prop_uid', )
     key_dates = relationship('MspLookupTableValues',
-                             primaryjoin='foreign(MspLookupTableValues.lt_struct_uid)==MspTaskCustomFieldsValues'
-                                         '.code_value',
+                             primaryjoin='and_(foreign(MspLookupTableValues.lt_struct_uid)==MspTaskCustomFieldsValues'
+                                         f'.code_value, MspLookupTableValues.lcid == {KEY_DATE_LCID})',
                              uselist=False, lazy='joined')
 
 
@@ -145,7 +149,7 @@ class MspLookupTableValues(Base):
 
     siteid = Column(UUID, primary_key=True, name='SiteId')
     lcid = Column(INTEGER, primary_key=True, name='LCID')
-    lt_struct_uid = Column(Integer, nullable=False, unique=True, primary_key=True, name='LT_STRUCT_UID')
+    lt_struct_uid = Column(UUID, nullable=False, unique=True, primary_key=True, name='LT_STRUCT_UID')
     lt_value_text = Column(NVARCHAR(length=255), name='LT_VALUE_TEXT')
 
 
@@ -180,7 +184,7 @@ class MspTaskBaselines(Base):
     async def map(self, _src_attr):
         dst_attr = self._get_map().get(_src_attr)
         if dst_attr:
-            return dst_attr, await getattr(self, _src_attr)
+            return dst_attr, getattr(self, _src_attr)
 
 
 class Project(Base):
@@ -194,6 +198,10 @@ class Project(Base):
     is_active = Column(Boolean, default=True)
     start_date = Column(DateTime, nullable=True)
     finish_date = Column(DateTime, nullable=True)
+    # последняя версия проекта, ее переставляет миграция в той же транзакции, что пишет версию
+    current_version_id = Column(Integer,
+                                ForeignKey('version.id', use_alter=True, name='fk_project_current_version_id'),
+                                nullable=True)
 
     key_dates = relationship('KeyDates', foreign_keys='KeyDates.project_id')
     base_plans = relationship('BasePlan', back_populates='project', uselist=True)
@@ -203,6 +211,10 @@ class BasePlan(Base):
     """  Базовые планы"""
 
     __tablename__ = 'base_plan'
+    __table_args__ = (
+        # поиск плана проекта по номеру и все планы проекта
+        UniqueConstraint('project_id', 'base_number', name='uq_base_plan_project_id_base_number'),
+    )
 
     id = Column(Integer, nullable=False, unique=True, primary_key=True, autoincrement=True)
     created_at = Column(DateTime, nullable=False)
@@ -211,8 +223,12 @@ class BasePlan(Base):
     base_plan_start_date = Column(DateTime, nullable=False)
     base_plan_finish_date = Column(DateTime, nullable=False)
     updated_at = Column(DateTime, default=datetime.now)
+    # последняя версия плана, ее переставляет миграция в той же транзакции, что пишет версию
+    current_version_id = Column(Integer,
+                                ForeignKey('version.id', use_alter=True, name='fk_base_plan_current_version_id'),
+                                nullable=True)
 
-    versions = relationship('Version', back_populates='base_plan', uselist=True)
+    versions = relationship('Version', back_populates='base_plan', uselist=True, foreign_keys='Version.base_plan_id')
     tasks = relationship('KeyDates', back_populates='base_plan', uselist=True)
     project = relationship('Project', back_populates='base_plans')
 
@@ -221,6 +237,13 @@ class KeyDates(Base):
     """  Ключевые даты"""
 
     __tablename__ = 'key_dates'
+    __table_args__ = (
+        Index('ix_key_dates_version_id', 'version_id'),
+        Index('ix_key_dates_base_plan_id', 'base_plan_id'),
+        Index('ix_key_dates_task_uuid', 'task_uuid'),
+        # ключевые даты проекта и max(updated_at) для ETag
+        Index('ix_key_dates_project_id_updated_at', 'project_id', 'updated_at'),
+    )
 
     id = Column(Integer, nullable=False, unique=True, primary_key=True, autoincrement=True)
     name = Column(String, nullable=False)
@@ -232,6 +255,8 @@ class KeyDates(Base):
     base_plan_id = Column(Integer, ForeignKey('base_plan.id'), nullable=True)
     project_id = Column(Integer, ForeignKey('project.id'), nullable=False)
     updated_at = Column(DateTime, default=datetime.now)
+    # в дельта-версии: таска удалена относительно родителя
+    is_removed = Column(Boolean, nullable=False, default=False, server_default=false())
 
     base_plan = relationship('BasePlan', back_populates='tasks', uselist=False)
     version = relationship('Version', back_populates='tasks', uselist=False)
@@ -241,12 +266,31 @@ class Version(Base):
     """  Версия миграции"""
 
     __tablename__ = 'version'
+    __table_args__ = (
+        # последняя версия проекта / плана - max(id), корневая версия плана - min(id)
+        Index('ix_version_project_id_id', 'project_id', 'id'),
+        Index('ix_version_base_plan_id_id', 'base_plan_id', 'id'),
+    )
 
     id = Column(Integer, nullable=False, unique=True, primary_key=True, autoincrement=True)
     migration_date = Column(DateTime, nullable=False, default=datetime.now)
     base_plan_id = Column(Integer, ForeignKey('base_plan.id'), nullable=True)
     project_id = Column(Integer, ForeignKey('project.id'), nullable=False)
     parent_version_id = Column(Integer, ForeignKey('version.id'), nullable=True)
+    # хранит только отличия от parent_version_id
+    is_delta = Column(Boolean, nullable=False, default=False, server_default=false())
 
-    base_plan = relationship('BasePlan', back_populates='versions', uselist=False)
+    base_plan = relationship('BasePlan', back_populates='versions', uselist=False, foreign_keys=[base_plan_id])
     tasks = relationship('KeyDates', back_populates='version', lazy='joined')
+
+
+class MigrationWatermark(Base):
+    """  Отметки миграции проектов MSSQL"""
+
+    __tablename__ = 'migration_watermark'
+
+    id = Column(Integer, nullable=False, unique=True, primary_key=True, autoincrement=True)
+    project_uuid = Column(UUID(as_uuid=True), nullable=False, unique=True)
+    last_created_date = Column(DateTime, nullable=True)
+    content_hash = Column(String(32), nullable=False)
+    updated_at = Column(DateTime, default=datetime.now)
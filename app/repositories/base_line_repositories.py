@@ -1,31 +1,131 @@
-from typing import Type, List
+from collections import defaultdict
+from typing import List, Dict
 
-from pydantic.tools import parse_obj_as
-from sqlalchemy import select
+from sqlalchemy import select, cast, Date
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from app.model.models import BasePlan
-from app.schema.baselines import BaseLinesOut
+from app.model.models import BasePlan, Version, KeyDates
+from app.repositories.version_diff_repositories import versions_state
+from app.schema.baselines import BaseLinesExpand
+
+
+# колонки ответа с метками по полям схем; DateTime приводится к date в БД, как это делала схема
+BASE_PLAN_COLUMNS = (
+    BasePlan.id,
+    cast(BasePlan.created_at, Date).label('created_at'),
+    BasePlan.base_number,
+    cast(BasePlan.base_plan_start_date, Date).label('base_plan_start_date'),
+    cast(BasePlan.base_plan_finish_date, Date).label('base_plan_finish_date'),
+    cast(BasePlan.updated_at, Date).label('updated_at'),
+)
+VERSION_COLUMNS = (
+    Version.id,
+    cast(Version.migration_date, Date).label('migration_date'),
+    Version.base_plan_id,
+    Version.project_id,
+    Version.parent_version_id,
+    Version.is_delta,
+)
+KEY_DATE_COLUMNS = (
+    KeyDates.id,
+    KeyDates.name,
+    cast(KeyDates.task_start_date, Date).label('task_start_date'),
+    KeyDates.task_uuid,
+    KeyDates.task_name,
+)
+
+
+def key_date_dict(row) -> dict:
+    """ Ключевая дата как KeyDatesBase: строки без крайних пробелов (anystr_strip_whitespace) """
+
+    key_date = row._asdict()
+    key_date['name'] = key_date['name'].strip()
+    if key_date['task_name'] is not None:
+        key_date['task_name'] = key_date['task_name'].strip()
+    return key_date
 
 
 class BaseLinesRepository:
     def __init__(self, db: AsyncSession) -> None:
         self.db: AsyncSession = db
 
-    @property
-    def _table(self) -> Type[BasePlan]:
-        return BasePlan
+    async def get_base_plans_rows(self, project_id: int,
+                                  expand: BaseLinesExpand = BaseLinesExpand.full) -> List[dict]:
+
+        """
+        Базовые планы проекта в объеме expand словарями, готовыми к сериализации в JSON.
+        Строится из кортежей Core select без ORM-объектов и валидации pydantic;
+        структура совпадает со схемой BASE_LINES_SCHEMAS[expand]
+        """
+
+        entry = await self.db.execute(
+            select(*BASE_PLAN_COLUMNS).where(BasePlan.project_id == project_id).order_by(BasePlan.id))
+        base_plans = [row._asdict() for row in entry.all()]
+        if expand == BaseLinesExpand.plans or not base_plans:
+            return base_plans
+        base_plan_ids = [base_plan['id'] for base_plan in base_plans]
+
+        if expand == BaseLinesExpand.latest:
+            version_ids = select(BasePlan.current_version_id).where(BasePlan.id.in_(base_plan_ids))
+        else:
+            version_ids = select(Version.id).where(Version.base_plan_id.in_(base_plan_ids))
+        entry = await self.db.execute(select(*VERSION_COLUMNS).where(Version.id.in_(version_ids)).order_by(Version.id))
+        versions = [row._asdict() for row in entry.all()]
+
+        if expand != BaseLinesExpand.versions:
+            key_dates = await self._version_key_dates([version['id'] for version in versions])
+            for version in versions:
+                version['tasks'] = key_dates[version['id']]
+
+        versions_by_plan = defaultdict(list)
+        for version in versions:
+            versions_by_plan[version['base_plan_id']].append(version)
+        if expand == BaseLinesExpand.latest:
+            for base_plan in base_plans:
+                plan_versions = versions_by_plan[base_plan['id']]
+                base_plan['latest_version'] = plan_versions[-1] if plan_versions else None
+            return base_plans
+
+        if expand == BaseLinesExpand.full:
+            key_dates = await self._key_dates_by(KeyDates.base_plan_id, base_plan_ids)
+            for base_plan in base_plans:
+                base_plan['tasks'] = key_dates[base_plan['id']]
+        for base_plan in base_plans:
+            base_plan['versions'] = versions_by_plan[base_plan['id']]
+        return base_plans
+
+    async def _version_key_dates(self, version_ids: List[int]) -> Dict[int, List[dict]]:
+
+        """
+        Актуальные ключевые даты версий, сгруппированные по версии.
+        Дельта-версия собирается по цепочке родителей (versions_state), удаленные таски не попадают
+        """
+
+        if not version_ids:
+            return defaultdict(list)
+        state = versions_state(version_ids, 'version_state')
+        return await self._grouped(
+            select(state.c.state_version_id.label('group_id'), state.c.id, state.c.name,
+                   cast(state.c.task_start_date, Date).label('task_start_date'), state.c.task_uuid,
+                   state.c.task_name)
+            .order_by(state.c.id))
 
-    async def get_base_plans_by_project_id(self, project_id: int) -> List[BaseLinesOut]:
+    async def _key_dates_by(self, column, ids: List[int]) -> Dict[int, List[dict]]:
 
-        """ Возвращает таблицу справочника услуг """
+        """ Ключевые даты, сгруппированные по column, без отметок удаления дельта-версий """
 
-        query = (
-            select(self._table)
-            .where(self._table.project_id == project_id)
-            .options(selectinload(self._table.tasks))
-            .options(selectinload(self._table.versions)))
+        if not ids:
+            return defaultdict(list)
+        return await self._grouped(
+            select(column.label('group_id'), *KEY_DATE_COLUMNS)
+            .where(column.in_(ids))
+            .where(KeyDates.is_removed.is_(False))
+            .order_by(KeyDates.id))
 
+    async def _grouped(self, query) -> Dict[int, List[dict]]:
+        key_dates = defaultdict(list)
         entry = await self.db.execute(query)
-        return parse_obj_as(List[BaseLinesOut], entry.scalars().all())
+        for row in entry.all():
+            key_date = key_date_dict(row)
+            key_dates[key_date.pop('group_id')].append(key_date)
+        return key_dates
@@ -0,0 +1,141 @@
+from typing import List, Dict, Tuple, Iterable, Set
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.model.models import Project, BasePlan, Version, KeyDates
+from app.repositories.current_version_repositories import CurrentVersionRepository
+
+# asyncpg ограничивает число параметров одного запроса 32767
+CHUNK_SIZE = 1000
+
+
+def uuid_key(value) -> str:
+    return str(value).lower()
+
+
+def chunked(rows: List[dict], size: int = CHUNK_SIZE) -> Iterable[List[dict]]:
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+class BulkWriteRepository:
+    """
+    Копит строки проектов, базовых планов, версий и ключевых дат в памяти
+    и пишет их многострочными INSERT ... RETURNING.
+
+    Внешние ключи между уровнями разрешаются по естественным ключам:
+    проект - uuid, базовый план - (project_id, base_number),
+    версия - base_plan_id (за один прогон у плана появляется не более одной версии).
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db: AsyncSession = db
+        self.projects: List[dict] = []
+        self.base_plans: List[dict] = []
+        self.versions: List[dict] = []
+        self.key_dates: List[dict] = []
+        # проекты, строки которых записаны или изменены с последнего pop_project_ids()
+        self.project_ids: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.projects) + len(self.base_plans) + len(self.versions) + len(self.key_dates)
+
+    def add_project(self, row: dict) -> None:
+        self.projects.append(row)
+
+    def mark_project(self, project_id: int) -> None:
+        """ Проект изменен мимо writer (например, обновлением строк в сессии) """
+        self.project_ids.add(project_id)
+
+    def pop_project_ids(self) -> Set[int]:
+        project_ids, self.project_ids = self.project_ids, set()
+        return project_ids
+
+    def add_base_plan(self, row: dict, project_uuid=None) -> None:
+        """ project_uuid - для плана нового проекта, id которого еще не известен """
+        self.base_plans.append({**row, '_project_uuid': project_uuid})
+
+    def add_version(self, row: dict, project_uuid=None, base_number: int = None) -> None:
+        """ project_uuid, base_number - для версии нового базового плана, id которого еще не известен """
+        self.versions.append({**row, '_project_uuid': project_uuid, '_base_number': base_number})
+
+    def add_key_dates(self, rows: List[dict], project_id: int = None, project_uuid=None,
+                      base_plan_id: int = None, base_number: int = None, version_id: int = None) -> None:
+        """
+        Привязка ключевых дат задается либо готовыми id, либо естественными ключами
+        еще не записанных проекта и базового плана (версия ищется по базовому плану)
+        """
+        for row in rows:
+            self.key_dates.append({
+                **row,
+                'project_id': project_id,
+                'base_plan_id': base_plan_id,
+                'version_id': version_id,
+                '_project_uuid': project_uuid,
+                '_base_number': base_number,
+            })
+
+    async def _insert_returning(self, model, rows: List[dict], *returning) -> List[Tuple]:
+        result = []
+        for chunk in chunked(rows):
+            entry = await self.db.execute(insert(model).values(chunk).returning(*returning))
+            result.extend(entry.all())
+        return result
+
+    @staticmethod
+    def _resolve_project(row: dict, project_ids: Dict) -> dict:
+        project_uuid = row.pop('_project_uuid')
+        if row.get('project_id') is None:
+            row['project_id'] = project_ids[uuid_key(project_uuid)]
+        return row
+
+    async def flush(self) -> int:
+        """ Записывает накопленные строки, по одному запросу на уровень (и чанк); возвращает их число """
+
+        rows_count = len(self)
+        project_ids = {}
+        if self.projects:
+            rows = await self._insert_returning(Project, self.projects, Project.id, Project.uuid)
+            project_ids = {uuid_key(uuid): project_id for project_id, uuid in rows}
+            self.project_ids.update(project_ids.values())
+
+        base_plan_ids = {}
+        if self.base_plans:
+            base_plans = [self._resolve_project(row, project_ids) for row in self.base_plans]
+            rows = await self._insert_returning(BasePlan, base_plans,
+                                                BasePlan.id, BasePlan.project_id, BasePlan.base_number)
+            base_plan_ids = {(project_id, base_number): base_plan_id
+                             for base_plan_id, project_id, base_number in rows}
+            self.project_ids.update(project_id for _, project_id, _ in rows)
+
+        version_ids = {}
+        if self.versions:
+            versions = []
+            for row in self.versions:
+                self._resolve_project(row, project_ids)
+                base_number = row.pop('_base_number')
+                if row.get('base_plan_id') is None:
+                    row['base_plan_id'] = base_plan_ids[(row['project_id'], base_number)]
+                versions.append(row)
+                self.project_ids.add(row['project_id'])
+            rows = await self._insert_returning(Version, versions, Version.id, Version.base_plan_id, Version.project_id)
+            version_ids = {base_plan_id: version_id for version_id, base_plan_id, _ in rows}
+            await CurrentVersionRepository(self.db).set_current_versions(rows)
+
+        if self.key_dates:
+            key_dates = []
+            for row in self.key_dates:
+                self._resolve_project(row, project_ids)
+                base_number = row.pop('_base_number')
+                if row.get('base_plan_id') is None:
+                    row['base_plan_id'] = base_plan_ids[(row['project_id'], base_number)]
+                if row.get('version_id') is None:
+                    row['version_id'] = version_ids[row['base_plan_id']]
+                key_dates.append(row)
+                self.project_ids.add(row['project_id'])
+            for chunk in chunked(key_dates):
+                await self.db.execute(insert(KeyDates).values(chunk))
+
+        self.projects, self.base_plans, self.versions, self.key_dates = [], [], [], []
+        return rows_count
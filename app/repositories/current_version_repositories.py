@@ -0,0 +1,54 @@
+from typing import Iterable, Tuple, List
+
+from sqlalchemy import select, update, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.model.models import Project, BasePlan
+from app.repositories.version_diff_repositories import versions_state
+
+
+class CurrentVersionRepository:
+    """
+    Указатели на последнюю версию проекта и базового плана (current_version_id).
+    Текущее состояние читается по указателю одним поиском по первичному ключу,
+    без обхода всех версий проекта
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db: AsyncSession = db
+
+    async def set_current_versions(self, versions: Iterable[Tuple[int, int, int]]) -> None:
+        """
+        Переставляет указатели на только что записанные версии - тройки (version_id, base_plan_id, project_id).
+        Вызывается в транзакции, которая пишет версии
+        """
+
+        base_plans, projects = {}, {}
+        for version_id, base_plan_id, project_id in versions:
+            if base_plan_id is not None:
+                base_plans[base_plan_id] = max(version_id, base_plans.get(base_plan_id, version_id))
+            projects[project_id] = max(version_id, projects.get(project_id, version_id))
+        if base_plans:
+            await self.db.execute(
+                update(BasePlan.__table__)
+                .where(BasePlan.__table__.c.id == bindparam('row_id'))
+                .values(current_version_id=bindparam('version_id')),
+                [{'row_id': row_id, 'version_id': version_id} for row_id, version_id in base_plans.items()])
+        if projects:
+            await self.db.execute(
+                update(Project.__table__)
+                .where(Project.__table__.c.id == bindparam('row_id'))
+                .values(current_version_id=bindparam('version_id')),
+                [{'row_id': row_id, 'version_id': version_id} for row_id, version_id in projects.items()])
+
+    async def get_current_key_dates(self, project_id: int) -> List:
+        """
+        Актуальные ключевые даты последней версии проекта по указателю одним запросом;
+        дельта-версия собирается по цепочке в БД (versions_state)
+        """
+
+        state = versions_state(select(Project.current_version_id).where(Project.id == project_id), 'current_state')
+        query = select(state.c.id, state.c.name, state.c.task_start_date, state.c.task_uuid,
+                       state.c.task_name).order_by(state.c.id)
+        entry = await self.db.execute(query)
+        return entry.all()
@@ -0,0 +1,62 @@
+from datetime import timedelta
+from typing import AsyncIterator
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.model.models import Project, BasePlan, Version, KeyDates
+from app.schema.export import KeyDatesExportFilter, EXPORT_CHUNK_SIZE
+
+KEY_DATES_EXPORT_COLUMNS = (
+    Project.id.label('project_id'),
+    Project.uuid.label('project_uuid'),
+    Project.name.label('project_name'),
+    BasePlan.id.label('base_plan_id'),
+    BasePlan.base_number,
+    Version.id.label('version_id'),
+    Version.migration_date,
+    Version.parent_version_id,
+    Version.is_delta,
+    KeyDates.id.label('key_date_id'),
+    KeyDates.name,
+    KeyDates.task_uuid,
+    KeyDates.task_name,
+    KeyDates.task_start_date,
+    KeyDates.task_finish_date,
+    KeyDates.is_removed,
+    KeyDates.updated_at,
+)
+
+
+class ExportRepository:
+    """
+    Выгрузка строк серверным курсором: в памяти одновременно только одна порция.
+    Строки выгружаются как хранятся: полная версия содержит все свои ключевые даты,
+    дельта-версия (is_delta) - только добавленные и измененные таски и отметки удаления (is_removed).
+    Состояние дельта-версии получатель собирает по parent_version_id до ближайшей полной версии,
+    накладывая строки от старых версий к новым и удаляя таски с is_removed
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db: AsyncSession = db
+
+    async def stream_key_dates(self, filters: KeyDatesExportFilter,
+                               chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[list]:
+        """ Ключевые даты с версией, базовым планом и проектом порциями по chunk_size, вместе с отметками удаления """
+
+        query = (
+            select(*KEY_DATES_EXPORT_COLUMNS)
+            .join(Version, Version.id == KeyDates.version_id)
+            .join(Project, Project.id == KeyDates.project_id)
+            .outerjoin(BasePlan, BasePlan.id == KeyDates.base_plan_id)
+            .order_by(KeyDates.project_id, KeyDates.version_id, KeyDates.id))
+        if filters.project_id is not None:
+            query = query.where(KeyDates.project_id == filters.project_id)
+        if filters.migration_date_from is not None:
+            query = query.where(Version.migration_date >= filters.migration_date_from)
+        if filters.migration_date_to is not None:
+            query = query.where(Version.migration_date < filters.migration_date_to + timedelta(days=1))
+
+        result = await self.db.stream(query.execution_options(yield_per=chunk_size))
+        async for partition in result.partitions(chunk_size):
+            yield partition
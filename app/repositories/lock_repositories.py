@@ -0,0 +1,25 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# ключ advisory lock миграции, общий для всех воркеров сервиса
+MIGRATION_LOCK_KEY = 7_301_220
+
+
+@asynccontextmanager
+async def advisory_lock(engine: AsyncEngine, key: int = MIGRATION_LOCK_KEY) -> AsyncIterator[bool]:
+    """
+    Сессионный advisory lock Postgres на отдельном соединении, удерживаемом до выхода.
+    Отдает False, если блокировку уже держит другой процесс.
+    """
+
+    async with engine.connect() as conn:
+        entry = await conn.execute(select(func.pg_try_advisory_lock(key)))
+        locked = entry.scalar()
+        try:
+            yield locked
+        finally:
+            if locked:
+                await conn.execute(select(func.pg_advisory_unlock(key)))
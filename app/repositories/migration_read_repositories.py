@@ -0,0 +1,230 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Dict, Iterable, AsyncIterator, Tuple, Optional
+
+from sqlalchemy import select, func, and_, literal
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.model.models import (MspProjects, MspTasks, MspTaskBaselines, MspTaskCustomFieldsValues,
+                              MspLookupTableValues, Project, Version, KEY_DATE_FIELD_UID, KEY_DATE_LCID)
+from app.repositories.bulk_repositories import uuid_key
+from app.repositories.version_diff_repositories import version_chain
+from app.services.mappers import project_mapper, key_date_mapper
+
+
+class SourceBaseLine:
+    """ Строка базового плана MSSQL с таской - ключевой датой """
+
+    __slots__ = ('tb_base_num', 'created_date', 'task')
+
+    def __init__(self, tb_base_num, created_date, task):
+        self.tb_base_num = tb_base_num
+        self.created_date = created_date
+        self.task = task
+
+
+class SourceProject:
+    """
+    Проект MSSQL только с тасками - ключевыми датами и их базовыми планами.
+    Таски - строки результата с атрибутами MspTasks (включая key_date)
+    """
+
+    __slots__ = ('proj_uid', 'proj_name', 'proj_info_start_date', 'proj_info_finish_date', 'base_lines', 'tasks')
+
+    def __init__(self, row):
+        self.proj_uid = row.proj_uid
+        self.proj_name = row.proj_name
+        self.proj_info_start_date = row.proj_info_start_date
+        self.proj_info_finish_date = row.proj_info_finish_date
+        self.base_lines: List[SourceBaseLine] = []
+        self.tasks: list = []
+
+
+def key_date_tasks(key_date_field_uid: str, lcid: int = KEY_DATE_LCID):
+    """
+    Таски, у которых в кастомном поле key_date_field_uid выбрано значение справочника,
+    вместе с текстом значения (LT_VALUE_TEXT) на языке lcid как key_date.
+    Значение справочника хранится по строке на язык: без lcid таска повторялась бы по числу переводов
+    """
+
+    return (
+        select(MspTasks.proj_uid.label('proj_uid'), *key_date_mapper.labeled_columns)
+        .join(MspTaskCustomFieldsValues,
+              and_(MspTaskCustomFieldsValues.task_uid == MspTasks.task_uid,
+                   MspTaskCustomFieldsValues.md_prop_uid == key_date_field_uid))
+        .join(MspLookupTableValues,
+              and_(MspLookupTableValues.lt_struct_uid == MspTaskCustomFieldsValues.code_value,
+                   MspLookupTableValues.lcid == lcid))
+        .where(MspLookupTableValues.lt_value_text.isnot(None))
+        .where(MspLookupTableValues.lt_value_text != ''))
+
+
+class MigrationReadRepository:
+    """ Чтение для миграции одним запросом на набор проектов вместо запроса на проект """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db: AsyncSession = db
+
+    @staticmethod
+    def _projects_query(proj_uids: Optional[List] = None):
+        query = select(*project_mapper.labeled_columns)
+        if proj_uids is not None:
+            query = query.where(MspProjects.proj_uid.in_(proj_uids))
+        return query
+
+    async def count_projects(self, proj_uids: Optional[List] = None) -> int:
+        query = select(func.count()).select_from(MspProjects)
+        if proj_uids is not None:
+            query = query.where(MspProjects.proj_uid.in_(proj_uids))
+        entry = await self.db.execute(query)
+        return entry.scalar()
+
+    async def get_all_projects(self, proj_uids: Optional[List] = None) -> list:
+        """ Колонки проектов без тасок; proj_uids - только указанные проекты """
+
+        entry = await self.db.execute(self._projects_query(proj_uids))
+        return entry.all()
+
+    async def stream_projects(self, chunk_size: int, proj_uids: Optional[List] = None) -> AsyncIterator[list]:
+        """ Колонки проектов серверным курсором порциями по chunk_size """
+
+        result = await self.db.stream(self._projects_query(proj_uids).execution_options(yield_per=chunk_size))
+        async for partition in result.partitions(chunk_size):
+            yield partition
+
+    async def get_source_projects(self, project_rows: list, key_date_field_uid: str = KEY_DATE_FIELD_UID,
+                                  lcid: int = KEY_DATE_LCID) -> List[SourceProject]:
+        """
+        Таски - ключевые даты и базовые планы по ним для порции проектов, двумя запросами.
+        Таски без ключевой даты отсекаются в БД и в память не попадают
+        """
+
+        projects = {uuid_key(row.proj_uid): SourceProject(row) for row in project_rows}
+        if not projects:
+            return []
+        proj_uids = [row.proj_uid for row in project_rows]
+
+        tasks_query = key_date_tasks(key_date_field_uid, lcid).where(MspTasks.proj_uid.in_(proj_uids))
+        entry = await self.db.execute(tasks_query)
+        tasks = {}
+        for task in entry.all():
+            tasks[uuid_key(task.task_uid)] = task
+            projects[uuid_key(task.proj_uid)].tasks.append(task)
+
+        tasks_subquery = tasks_query.subquery()
+        base_lines_query = (
+            select(MspTaskBaselines.proj_uid, MspTaskBaselines.tb_base_num, MspTaskBaselines.created_date,
+                   MspTaskBaselines.task_uid)
+            .join(tasks_subquery, tasks_subquery.c.task_uid == MspTaskBaselines.task_uid)
+            .where(MspTaskBaselines.proj_uid.in_(proj_uids))
+            .order_by(MspTaskBaselines.created_date))
+        entry = await self.db.execute(base_lines_query)
+        for proj_uid, tb_base_num, created_date, task_uid in entry.all():
+            projects[uuid_key(proj_uid)].base_lines.append(
+                SourceBaseLine(tb_base_num, created_date, tasks[uuid_key(task_uid)]))
+        return list(projects.values())
+
+    async def get_source_watermarks(self, key_date_field_uid: str = KEY_DATE_FIELD_UID, lcid: int = KEY_DATE_LCID
+                                    ) -> Dict[str, Tuple[Optional[datetime], str]]:
+        """
+        Отметка состояния каждого проекта MSSQL, посчитанная агрегатом в БД:
+        самая поздняя дата создания базового плана и md5 от всех полей, которые пишет миграция, -
+        названия и дат проекта, названий, дат и ключевых дат (код и текст) тасок,
+        состава и дат базовых планов
+        """
+
+        tasks_state = (
+            select(
+                MspTasks.proj_uid.label('proj_uid'),
+                func.md5(func.string_agg(
+                    func.concat_ws('|', MspTasks.task_uid, MspTasks.task_name, MspTasks.task_start_date,
+                                   MspTasks.task_finish_date, MspTaskCustomFieldsValues.code_value,
+                                   MspLookupTableValues.lt_value_text),
+                    aggregate_order_by(literal(','), MspTasks.task_uid))).label('tasks_hash'))
+            .outerjoin(MspTaskCustomFieldsValues,
+                       and_(MspTaskCustomFieldsValues.task_uid == MspTasks.task_uid,
+                            MspTaskCustomFieldsValues.md_prop_uid == key_date_field_uid))
+            .outerjoin(MspLookupTableValues,
+                       and_(MspLookupTableValues.lt_struct_uid == MspTaskCustomFieldsValues.code_value,
+                            MspLookupTableValues.lcid == lcid))
+            .group_by(MspTasks.proj_uid)
+            .subquery())
+        base_lines_state = (
+            select(
+                MspTaskBaselines.proj_uid.label('proj_uid'),
+                func.max(MspTaskBaselines.created_date).label('last_created_date'),
+                func.md5(func.string_agg(
+                    func.concat_ws('|', MspTaskBaselines.tb_base_num, MspTaskBaselines.task_uid,
+                                   MspTaskBaselines.created_date, MspTaskBaselines.tb_base_start,
+                                   MspTaskBaselines.tb_base_finish),
+                    aggregate_order_by(literal(','), MspTaskBaselines.tb_base_num,
+                                       MspTaskBaselines.task_uid))).label('base_lines_hash'))
+            .group_by(MspTaskBaselines.proj_uid)
+            .subquery())
+        query = (
+            select(MspProjects.proj_uid, base_lines_state.c.last_created_date,
+                   func.md5(func.concat_ws('|', MspProjects.proj_name, MspProjects.proj_info_start_date,
+                                           MspProjects.proj_info_finish_date, tasks_state.c.tasks_hash,
+                                           base_lines_state.c.base_lines_hash)))
+            .outerjoin(tasks_state, tasks_state.c.proj_uid == MspProjects.proj_uid)
+            .outerjoin(base_lines_state, base_lines_state.c.proj_uid == MspProjects.proj_uid))
+        entry = await self.db.execute(query)
+        return {uuid_key(proj_uid): (last_created_date, content_hash)
+                for proj_uid, last_created_date, content_hash in entry.all()}
+
+    async def get_exists_projects(self, uuids: Iterable) -> Dict[str, Project]:
+        """
+        Уже мигрированные проекты с базовыми планами по uuid, без ключевых дат:
+        под базовым планом лежат строки всех его версий, нужные же только корневой - get_main_versions
+        """
+
+        query = (
+            select(Project)
+            .where(Project.uuid.in_([str(uuid) for uuid in uuids]))
+            .options(selectinload(Project.base_plans)))
+        entry = await self.db.execute(query)
+        return {uuid_key(project.uuid): project for project in entry.scalars().all()}
+
+    async def get_last_versions(self, project_ids: Iterable[int]) -> Dict[int, Version]:
+        """ Последняя версия каждого проекта вместе с тасками - по указателю project.current_version_id """
+
+        query = (
+            select(Version)
+            .join(Project, Project.current_version_id == Version.id)
+            .where(Project.id.in_(list(project_ids))))
+        entry = await self.db.execute(query)
+        return {version.project_id: version for version in entry.unique().scalars().all()}
+
+    async def get_delta_chains(self, versions: Iterable[Version]) -> Dict[int, List[Version]]:
+        """
+        Для каждой дельта-версии - цепочка версий с тасками от ближайшей полной версии
+        до нее самой, одним рекурсивным запросом
+        """
+
+        version_ids = [version.id for version in versions if version is not None and version.is_delta]
+        if not version_ids:
+            return {}
+        chain = version_chain(version_ids, 'version_chain')
+        entry = await self.db.execute(select(chain.c.leaf_id, chain.c.id))
+        leafs = defaultdict(list)
+        for leaf_id, chain_version_id in entry.all():
+            leafs[leaf_id].append(chain_version_id)
+
+        query = select(Version).where(Version.id.in_({i for ids in leafs.values() for i in ids}))
+        entry = await self.db.execute(query)
+        chain_versions = {version.id: version for version in entry.unique().scalars().all()}
+        return {leaf_id: [chain_versions[i] for i in sorted(ids)] for leaf_id, ids in leafs.items()}
+
+    async def get_main_versions(self, base_plan_ids: Iterable[int]) -> Dict[int, Version]:
+        """ Первая (корневая) версия каждого базового плана с ее ключевыми датами, одним запросом по version_id """
+
+        main_ids = (
+            select(func.min(Version.id))
+            .where(Version.base_plan_id.in_(list(base_plan_ids)))
+            .where(Version.parent_version_id.is_(None))
+            .group_by(Version.base_plan_id))
+        query = select(Version).where(Version.id.in_(main_ids))
+        entry = await self.db.execute(query)
+        return {version.base_plan_id: version for version in entry.unique().scalars().all()}
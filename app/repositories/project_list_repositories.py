@@ -0,0 +1,55 @@
+from datetime import timedelta
+from typing import Type, List, Optional, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.model.models import Project, BasePlan, Version
+from app.schema.base import PaginationParams
+from app.schema.project import ProjectFilter
+
+
+class ProjectListRepository:
+    def __init__(self, db: AsyncSession) -> None:
+        self.db: AsyncSession = db
+
+    @property
+    def _table(self) -> Type[Project]:
+        return Project
+
+    def _filter(self, query, filters: ProjectFilter):
+        if filters.is_active is not None:
+            query = query.where(self._table.is_active.is_(filters.is_active))
+        if filters.date_from:
+            query = query.where(self._table.start_date >= filters.date_from)
+        if filters.date_to:
+            # finish_date - дата со временем: проекты, завершающиеся в течение date_to, входят в выборку
+            query = query.where(self._table.finish_date < filters.date_to + timedelta(days=1))
+        if filters.name:
+            # %, _ и \ в названии ищутся как обычные символы, а не как шаблон LIKE
+            name = filters.name.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            query = query.where(self._table.name.ilike(f'%{name}%', escape='\\'))
+        return query
+
+    async def get_projects_page(self, filters: ProjectFilter, pagination: PaginationParams,
+                                after_id: Optional[int] = None) -> Tuple[List[Project], int]:
+
+        """ Страница проектов по возрастанию id и общее число проектов под фильтром.
+            after_id - ключ страницы (id последнего проекта предыдущей), иначе смещение по page """
+
+        total_query = self._filter(select(func.count()).select_from(self._table), filters)
+        total_count = (await self.db.execute(total_query)).scalar()
+
+        query = (
+            self._filter(select(self._table), filters)
+            .order_by(self._table.id)
+            .limit(pagination.max_per_page)
+            .options(selectinload(self._table.base_plans).selectinload(BasePlan.versions).noload(Version.tasks)))
+        if after_id is not None:
+            query = query.where(self._table.id > after_id)
+        else:
+            query = query.offset((pagination.page - 1) * pagination.max_per_page)
+
+        entry = await self.db.execute(query)
+        return entry.scalars().all(), total_count
@@ -0,0 +1,47 @@
+from typing import AsyncIterator, Dict
+
+from sqlalchemy import select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.model.models import Project, BasePlan, Version, KeyDates
+from app.repositories.version_diff_repositories import version_chain
+from app.schema.snapshot import SNAPSHOT_BATCH_SIZE
+
+SNAPSHOT_TABLES = (Project.__table__, BasePlan.__table__, Version.__table__, KeyDates.__table__)
+
+
+def current_version_ids():
+    """
+    Текущие версии проектов и базовых планов вместе с цепочками дельта-версий
+    до ближайшей полной версии - по ним восстанавливается текущее состояние
+    """
+
+    pointers = union(
+        select(Project.current_version_id.label('id')).where(Project.current_version_id.isnot(None)),
+        select(BasePlan.current_version_id.label('id')).where(BasePlan.current_version_id.isnot(None)),
+    ).subquery()
+    chain = version_chain(select(pointers.c.id), 'current_chain')
+    return select(chain.c.id)
+
+
+class SnapshotRepository:
+    """ Таблицы отчетной схемы целиком серверным курсором """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db: AsyncSession = db
+
+    def _query(self, table, current_only: bool):
+        query = select(table).order_by(table.c.id)
+        if current_only and table is Version.__table__:
+            query = query.where(table.c.id.in_(current_version_ids()))
+        elif current_only and table is KeyDates.__table__:
+            query = query.where(table.c.version_id.in_(current_version_ids()))
+        return query
+
+    async def stream_table(self, table, current_only: bool = False,
+                           batch_size: int = SNAPSHOT_BATCH_SIZE) -> AsyncIterator[Dict[str, list]]:
+        """ Строки таблицы порциями по batch_size - по колонкам, как их ждет record batch """
+
+        result = await self.db.stream(self._query(table, current_only).execution_options(yield_per=batch_size))
+        async for partition in result.partitions(batch_size):
+            yield {column.name: list(values) for column, values in zip(table.columns, zip(*partition))}
@@ -0,0 +1,42 @@
+from typing import Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.model.models import Project, BasePlan, Version, KeyDates
+
+
+class StateRepository:
+    """
+    Отметки состояния данных для ETag: несколько агрегатов одним запросом.
+    Меняются при каждой миграции, которая что-то записала, и не требуют строить ответ
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db: AsyncSession = db
+
+    async def get_project_state(self, project_id: int) -> Tuple:
+        """ Состояние базовых планов, версий и ключевых дат одного проекта """
+
+        query = select(
+            select(func.count(BasePlan.id)).where(BasePlan.project_id == project_id).scalar_subquery(),
+            select(func.max(BasePlan.updated_at)).where(BasePlan.project_id == project_id).scalar_subquery(),
+            select(func.max(Version.id)).where(Version.project_id == project_id).scalar_subquery(),
+            select(func.max(Version.migration_date)).where(Version.project_id == project_id).scalar_subquery(),
+            select(func.max(KeyDates.updated_at)).where(KeyDates.project_id == project_id).scalar_subquery(),
+        )
+        entry = await self.db.execute(query)
+        return tuple(entry.one())
+
+    async def get_projects_state(self) -> Tuple:
+        """ Состояние списка проектов: проекты, их базовые планы и версии (без ключевых дат) """
+
+        query = select(
+            select(func.count(Project.id)).scalar_subquery(),
+            select(func.max(Project.id)).scalar_subquery(),
+            select(func.max(BasePlan.id)).scalar_subquery(),
+            select(func.max(BasePlan.updated_at)).scalar_subquery(),
+            select(func.max(Version.id)).scalar_subquery(),
+        )
+        entry = await self.db.execute(query)
+        return tuple(entry.one())
@@ -0,0 +1,102 @@
+from typing import List, Optional, Tuple, Iterable
+
+from sqlalchemy import select, func, and_, or_, case, cast, Date
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.model.models import BasePlan, Version, KeyDates
+
+
+def version_chain(version_ids, name: str):
+    """
+    Рекурсивный CTE: версии version_ids вместе с родителями дельта-версий до ближайшей полной версии.
+    leaf_id - версия из version_ids, к цепочке которой относится строка
+    """
+
+    chain = (
+        select(Version.id, Version.parent_version_id, Version.is_delta, Version.id.label('leaf_id'))
+        .where(Version.id.in_(version_ids))
+        .cte(name, recursive=True))
+    parent = select(Version.id, Version.parent_version_id, Version.is_delta, chain.c.leaf_id).join(
+        chain, and_(Version.id == chain.c.parent_version_id, chain.c.is_delta.is_(True)))
+    return chain.union_all(parent)
+
+
+def versions_state(version_ids, name: str):
+    """
+    Актуальные ключевые даты нескольких версий одним подзапросом, версия - в колонке state_version_id.
+    Для дельта-версии состояние собирается по цепочке родителей до ближайшей полной версии:
+    по каждой таске берется строка самой поздней версии цепочки, удаленные отбрасываются
+    """
+
+    chain = version_chain(version_ids, f'{name}_chain')
+    latest = (
+        select(chain.c.leaf_id.label('state_version_id'), KeyDates.id, KeyDates.task_uuid, KeyDates.name,
+               KeyDates.task_name, KeyDates.task_start_date, KeyDates.task_finish_date, KeyDates.is_removed)
+        .join(chain, KeyDates.version_id == chain.c.id)
+        .distinct(chain.c.leaf_id, KeyDates.task_uuid)
+        .order_by(chain.c.leaf_id, KeyDates.task_uuid, KeyDates.version_id.desc())
+        .subquery(f'{name}_latest'))
+    return select(latest).where(latest.c.is_removed.is_(False)).subquery(name)
+
+
+def version_state(version_id: int, name: str):
+    """ Актуальные ключевые даты одной версии подзапросом """
+
+    return versions_state([version_id], name)
+
+
+class VersionDiffRepository:
+    """ Сравнение двух версий базового плана в БД: наружу уходят только отличия """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db: AsyncSession = db
+
+    async def get_default_versions(self, base_plan_id: int) -> Tuple[Optional[int], Optional[int]]:
+        """ Корневая версия базового плана (сам базовый план) и его текущая версия """
+
+        main_id = (
+            select(func.min(Version.id))
+            .where(Version.base_plan_id == base_plan_id)
+            .where(Version.parent_version_id.is_(None))
+            .scalar_subquery())
+        entry = await self.db.execute(
+            select(main_id, BasePlan.current_version_id).where(BasePlan.id == base_plan_id))
+        row = entry.first()
+        return tuple(row) if row else (None, None)
+
+    async def versions_belong(self, base_plan_id: int, version_ids: Iterable[int]) -> bool:
+        version_ids = set(version_ids)
+        entry = await self.db.execute(
+            select(func.count(Version.id))
+            .where(Version.id.in_(version_ids))
+            .where(Version.base_plan_id == base_plan_id))
+        return entry.scalar() == len(version_ids)
+
+    async def diff(self, from_version_id: int, to_version_id: int) -> List:
+        """ Добавленные, удаленные и сдвинутые таски версии to относительно from, с разницей в днях """
+
+        src = version_state(from_version_id, 'from_state')
+        dst = version_state(to_version_id, 'to_state')
+        query = (
+            select(
+                func.coalesce(dst.c.task_uuid, src.c.task_uuid).label('task_uuid'),
+                func.coalesce(dst.c.name, src.c.name).label('name'),
+                func.coalesce(dst.c.task_name, src.c.task_name).label('task_name'),
+                case((src.c.task_uuid.is_(None), 'added'),
+                     (dst.c.task_uuid.is_(None), 'removed'),
+                     else_='shifted').label('change'),
+                cast(src.c.task_start_date, Date).label('from_start_date'),
+                cast(src.c.task_finish_date, Date).label('from_finish_date'),
+                cast(dst.c.task_start_date, Date).label('to_start_date'),
+                cast(dst.c.task_finish_date, Date).label('to_finish_date'),
+                (cast(dst.c.task_start_date, Date) - cast(src.c.task_start_date, Date)).label('start_delta_days'),
+                (cast(dst.c.task_finish_date, Date) - cast(src.c.task_finish_date, Date)).label('finish_delta_days'),
+            )
+            .select_from(src.join(dst, src.c.task_uuid == dst.c.task_uuid, full=True))
+            .where(or_(src.c.task_uuid.is_(None),
+                       dst.c.task_uuid.is_(None),
+                       src.c.task_start_date.is_distinct_from(dst.c.task_start_date),
+                       src.c.task_finish_date.is_distinct_from(dst.c.task_finish_date)))
+            .order_by('change', 'task_uuid'))
+        entry = await self.db.execute(query)
+        return entry.all()
@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import Dict, Tuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.model.models import MigrationWatermark
+from app.repositories.bulk_repositories import chunked
+
+
+class WatermarkRepository:
+    def __init__(self, db: AsyncSession) -> None:
+        self.db: AsyncSession = db
+
+    @property
+    def _table(self):
+        return MigrationWatermark
+
+    async def get_watermarks(self) -> Dict[str, Tuple[Optional[datetime], str]]:
+
+        """ Отметки последней миграции по uuid проекта """
+
+        query = select(self._table.project_uuid, self._table.last_created_date, self._table.content_hash)
+        entry = await self.db.execute(query)
+        return {str(project_uuid).lower(): (last_created_date, content_hash)
+                for project_uuid, last_created_date, content_hash in entry.all()}
+
+    async def save_watermarks(self, watermarks: Dict[str, Tuple[Optional[datetime], str]]) -> None:
+
+        """ Сохраняет отметки мигрированных проектов (upsert по uuid) """
+
+        now = datetime.now()
+        rows = [{'project_uuid': project_uuid, 'last_created_date': last_created_date,
+                 'content_hash': content_hash, 'updated_at': now}
+                for project_uuid, (last_created_date, content_hash) in watermarks.items()]
+        for chunk in chunked(rows):
+            query = insert(self._table).values(chunk)
+            query = query.on_conflict_do_update(
+                index_elements=[self._table.project_uuid],
+                set_={
+                    'last_created_date': query.excluded.last_created_date,
+                    'content_hash': query.excluded.content_hash,
+                    'updated_at': query.excluded.updated_at,
+                })
+            await self.db.execute(query)
@@ -1,11 +1,22 @@
 from datetime import date
-from typing import List
+from enum import Enum
+from typing import List, Optional, Union
+
+from pydantic import Field
 
 from app.schema.key_dates import KeyDatesBase
 from app.schema.response import BaseSchema
 from app.schema.versions import VersionsBase, VersionsBaseOut
 
 
+class BaseLinesExpand(str, Enum):
+    plans = 'plans'        # только базовые планы
+    versions = 'versions'  # планы и версии без ключевых дат
+    tasks = 'tasks'        # планы и версии с ключевыми датами
+    latest = 'latest'      # планы и только последняя версия с ключевыми датами
+    full = 'full'          # планы с ключевыми датами и версии с ключевыми датами
+
+
 class BaseLinesBase(BaseSchema):
     id: int
     created_at: date
@@ -33,3 +44,37 @@ class BaseLinesChildVersions(BaseLinesBase):
 
     class Config:
         orm_mode = True
+
+
+class BaseLinesChildVersionsOut(BaseLinesBase):
+
+    versions: List[VersionsBaseOut]
+
+    class Config:
+        orm_mode = True
+
+
+class BaseLinesLatestVersion(BaseLinesBase):
+
+    latest_version: Optional[VersionsBaseOut] = Field(...)
+
+    class Config:
+        orm_mode = True
+
+
+# от самой полной схемы к самой узкой: Union в pydantic берет первую подходящую
+BaseLinesResponse = Union[
+    List[BaseLinesOut],
+    List[BaseLinesLatestVersion],
+    List[BaseLinesChildVersionsOut],
+    List[BaseLinesChildVersions],
+    List[BaseLinesBase],
+]
+
+BASE_LINES_SCHEMAS = {
+    BaseLinesExpand.plans: BaseLinesBase,
+    BaseLinesExpand.versions: BaseLinesChildVersions,
+    BaseLinesExpand.tasks: BaseLinesChildVersionsOut,
+    BaseLinesExpand.latest: BaseLinesLatestVersion,
+    BaseLinesExpand.full: BaseLinesOut,
+}
@@ -0,0 +1,25 @@
+from datetime import date
+from enum import Enum
+from typing import Optional
+
+from app.schema.response import BaseSchema
+
+# строк на одну выборку серверного курсора и на одну отправку клиенту
+EXPORT_CHUNK_SIZE = 1000
+
+
+class ExportFormat(str, Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.ndjson: 'application/x-ndjson',
+    ExportFormat.csv: 'text/csv',
+}
+
+
+class KeyDatesExportFilter(BaseSchema):
+    project_id: Optional[int] = None
+    migration_date_from: Optional[date] = None
+    migration_date_to: Optional[date] = None
@@ -0,0 +1,15 @@
+from app.schema.response import BaseSchema
+
+
+class PoolStatus(BaseSchema):
+    name: str
+    size: int              # постоянные соединения пула (pool_size)
+    capacity: int          # pool_size + max_overflow
+    checked_in: int        # свободные соединения
+    checked_out: int       # выданные сейчас соединения
+    overflow: int          # открытые сверх pool_size (отрицательное - еще не открытые постоянные)
+    checkouts: int         # выдач соединений с запуска
+    wait_time_total: float  # секунд ожидания свободного соединения, всего
+    wait_time_avg: float
+    wait_time_max: float
+    timeouts: int          # запросов, не дождавшихся соединения за pool_timeout
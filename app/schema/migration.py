@@ -0,0 +1,60 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional, List
+from uuid import UUID
+
+from pydantic import Field
+
+from app.model.models import KEY_DATE_FIELD_UID, KEY_DATE_LCID
+from app.schema.response import BaseSchema
+
+MIGRATION_CHUNK_SIZE = 100
+MIGRATION_CONCURRENCY = 4
+
+
+class MigrationStatus(str, Enum):
+    created = 'created'
+    updated = 'updated'
+    skipped = 'skipped'
+    failed = 'failed'
+
+
+class ProjectMigrationResult(BaseSchema):
+    proj_uid: str
+    status: MigrationStatus
+    error: Optional[str] = None
+
+
+class MigrationJobState(str, Enum):
+    pending = 'pending'
+    running = 'running'
+    done = 'done'
+    failed = 'failed'
+
+
+class MigrationParams(BaseSchema):
+    bulk: bool = False
+    stream: bool = False
+    incremental: bool = False
+    parallel: bool = False
+    delta: bool = False
+    chunk_size: int = Field(MIGRATION_CHUNK_SIZE, ge=1)
+    concurrency: int = Field(MIGRATION_CONCURRENCY, ge=1)
+    key_date_field_uid: str = KEY_DATE_FIELD_UID
+    key_date_lcid: int = KEY_DATE_LCID
+
+
+class MigrationJobOut(BaseSchema):
+    id: UUID
+    state: MigrationJobState
+    params: MigrationParams
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    projects_total: Optional[int] = None
+    projects_done: int = 0
+    rows_written: int = 0
+    projects_per_second: float = 0
+    rows_per_second: float = 0
+    error: Optional[str] = None
+    results: Optional[List[ProjectMigrationResult]] = None
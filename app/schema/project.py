@@ -1,8 +1,9 @@
 from datetime import date
-from typing import List
+from typing import List, Optional
 
 from uuid import UUID
 
+from app.schema.base import Paginator
 from app.schema.baselines import BaseLinesChildVersions
 from app.schema.response import BaseSchema
 
@@ -19,3 +20,16 @@ class ProjectBase(BaseSchema):
 
     class Config:
         orm_mode = True
+
+
+class ProjectFilter(BaseSchema):
+    is_active: Optional[bool] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    name: Optional[str] = None
+
+
+class ProjectPage(Paginator):
+    after_id: Optional[int] = None
+    next_after_id: Optional[int] = None
+    items: List[ProjectBase]
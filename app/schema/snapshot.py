@@ -0,0 +1,43 @@
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseSettings
+
+from app.schema.response import BaseSchema
+
+# строк в одном record batch
+SNAPSHOT_BATCH_SIZE = 10_000
+
+
+class SnapshotFormat(str, Enum):
+    parquet = 'parquet'
+    arrow = 'arrow'  # Arrow IPC file, читается через memory map
+
+
+class SnapshotSettings(BaseSettings):
+    """
+    Колоночные снимки таблиц project, base_plan, version, key_dates.
+    directory - каталог снимков, без него снимки выключены;
+    after_migration - писать снимок после каждой успешной миграции
+    """
+
+    directory: Optional[str] = None
+    format: SnapshotFormat = SnapshotFormat.parquet
+    current_only: bool = False
+    after_migration: bool = False
+
+    class Config:
+        env_prefix = 'snapshot_'
+
+
+class SnapshotFile(BaseSchema):
+    table: str
+    path: str
+    rows: int
+
+
+class SnapshotOut(BaseSchema):
+    directory: str
+    format: SnapshotFormat
+    current_only: bool
+    files: List[SnapshotFile]
@@ -0,0 +1,35 @@
+from datetime import date
+from enum import Enum
+from typing import List, Optional
+from uuid import UUID
+
+from app.schema.response import BaseSchema
+
+
+class KeyDateChangeType(str, Enum):
+    added = 'added'      # таски нет в версии from
+    removed = 'removed'  # таски нет в версии to
+    shifted = 'shifted'  # у таски изменились даты
+
+
+class KeyDateChange(BaseSchema):
+    task_uuid: UUID
+    name: str
+    task_name: Optional[str] = None
+    change: KeyDateChangeType
+    from_start_date: Optional[date] = None
+    from_finish_date: Optional[date] = None
+    to_start_date: Optional[date] = None
+    to_finish_date: Optional[date] = None
+    start_delta_days: Optional[int] = None   # to - from, только для shifted
+    finish_delta_days: Optional[int] = None
+
+    class Config:
+        orm_mode = True
+
+
+class VersionDiffOut(BaseSchema):
+    base_plan_id: int
+    from_version_id: int
+    to_version_id: int
+    changes: List[KeyDateChange]
@@ -11,6 +11,7 @@ class VersionsBase(BaseSchema):
     base_plan_id: int
     project_id: int
     parent_version_id: int = None
+    is_delta: bool = None
 
     class Config:
         orm_mode = True
@@ -1,23 +1,62 @@
-from typing import List
+from http import HTTPStatus
+from typing import List, Optional
 
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_async_session
+from app.database import get_read_session
+from app.helpers.etag import make_etag
+from app.helpers.exception import BaseException, ErrorCode
 from app.repositories.base_line_repositories import BaseLinesRepository
-from app.schema.baselines import BaseLinesOut
+from app.repositories.state_repositories import StateRepository
+from app.repositories.version_diff_repositories import VersionDiffRepository
+from app.schema.baselines import BaseLinesExpand
+from app.schema.version_diff import VersionDiffOut, KeyDateChange
 
 
 class BaseLinesService:
 
-    def __init__(self, db: AsyncSession = Depends(get_async_session)):
+    def __init__(self, db: AsyncSession = Depends(get_read_session)):
         self.repo = BaseLinesRepository(db)
+        self.state_repo = StateRepository(db)
+        self.diff_repo = VersionDiffRepository(db)
 
-    async def get_base_plans(self, project_id: int) -> List[BaseLinesOut]:
+    async def get_base_plans_rows(self, project_id: int,
+                                  expand: BaseLinesExpand = BaseLinesExpand.full) -> List[dict]:
         """
-        Отдает базовые планы по проекту
+        Базовые планы по проекту словарями из строк БД, без ORM и pydantic
         project_id: ID проекта
+        expand: объем ответа
         """
-        result = await self.repo.get_base_plans_by_project_id(project_id)
+        return await self.repo.get_base_plans_rows(project_id, expand)
 
-        return result
+    async def get_etag(self, project_id: int, expand: BaseLinesExpand = BaseLinesExpand.full) -> str:
+        """
+        ETag ответа по агрегату состояния проекта, без построения самого ответа
+        project_id: ID проекта
+        expand: объем ответа
+        """
+        state = await self.state_repo.get_project_state(project_id)
+        return make_etag('baselines', project_id, expand.value, *state)
+
+    async def get_versions_diff(self, base_plan_id: int, from_version_id: Optional[int] = None,
+                                to_version_id: Optional[int] = None) -> VersionDiffOut:
+        """
+        Отличия ключевых дат двух версий базового плана
+        base_plan_id: ID базового плана
+        from_version_id: по умолчанию корневая версия - сам базовый план
+        to_version_id: по умолчанию текущая версия плана
+        """
+        main_version_id, current_version_id = await self.diff_repo.get_default_versions(base_plan_id)
+        from_version_id = from_version_id or main_version_id
+        to_version_id = to_version_id or current_version_id
+        if from_version_id is None or to_version_id is None or \
+                not await self.diff_repo.versions_belong(base_plan_id, [from_version_id, to_version_id]):
+            raise BaseException(HTTPStatus.NOT_FOUND, ErrorCode.VERSION_NOT_FOUND)
+        changes = await self.diff_repo.diff(from_version_id, to_version_id)
+        return VersionDiffOut(
+            base_plan_id=base_plan_id,
+            from_version_id=from_version_id,
+            to_version_id=to_version_id,
+            changes=[KeyDateChange.from_orm(change) for change in changes],
+        )
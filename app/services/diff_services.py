@@ -0,0 +1,58 @@
+from typing import List, Iterable, Optional
+
+from app.model.models import KeyDates, Version
+from app.repositories.bulk_repositories import uuid_key
+
+
+class Changeset:
+    """ Отличия тасок MSSQL от ключевых дат версии """
+
+    def __init__(self):
+        self.added: list = []        # таски MSSQL, которых нет в версии
+        self.changed: list = []      # пары (таска MSSQL, ключевая дата версии) с другими датами
+        self.removed: List[KeyDates] = []  # ключевые даты версии, которых больше нет в MSSQL
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+class TaskIndex:
+    """ Ключевые даты версии по uuid таски. Строится один раз, поиск таски - O(1) """
+
+    def __init__(self, key_dates: Iterable[KeyDates]):
+        self.key_dates = {uuid_key(key_date.task_uuid): key_date for key_date in key_dates}
+
+    def diff(self, tasks, with_removed: bool = True) -> Changeset:
+        changeset = Changeset()
+        seen = set()
+        for task in tasks:
+            task_uuid = uuid_key(task.task_uid)
+            seen.add(task_uuid)
+            key_date = self.key_dates.get(task_uuid)
+            if key_date is None:
+                changeset.added.append(task)
+            elif task.task_start_date != key_date.task_start_date or \
+                    task.task_finish_date != key_date.task_finish_date:
+                changeset.changed.append((task, key_date))
+        if with_removed:
+            changeset.removed = [key_date for task_uuid, key_date in self.key_dates.items() if task_uuid not in seen]
+        return changeset
+
+
+def current_key_dates(version: Version, chain: Optional[List[Version]] = None) -> List[KeyDates]:
+    """
+    Актуальные ключевые даты версии.
+    Дельта-версия хранит только отличия от родителя, поэтому состояние собирается
+    по цепочке от ближайшей полной версии (chain отсортирована от нее к version)
+    """
+
+    if not version.is_delta:
+        return list(version.tasks)
+    state = {}
+    for chain_version in chain:
+        for key_date in chain_version.tasks:
+            if key_date.is_removed:
+                state.pop(uuid_key(key_date.task_uuid), None)
+            else:
+                state[uuid_key(key_date.task_uuid)] = key_date
+    return list(state.values())
@@ -0,0 +1,38 @@
+import csv
+from io import StringIO
+from typing import AsyncIterator
+
+from app.database import async_session, read_router
+from app.helpers.serialization import dumps
+from app.repositories.export_repositories import ExportRepository, KEY_DATES_EXPORT_COLUMNS
+from app.schema.export import ExportFormat, KeyDatesExportFilter
+
+
+class ExportService:
+    """
+    Сессия открывается в самом генераторе, а не берется из зависимости:
+    зависимости с yield закрываются до отправки тела StreamingResponse
+    """
+
+    async def export_key_dates(self, filters: KeyDatesExportFilter,
+                               export_format: ExportFormat = ExportFormat.ndjson) -> AsyncIterator[bytes]:
+        """
+        Ключевые даты с версией, базовым планом и проектом по порциям:
+        каждая порция строк курсора сразу уходит клиенту одним куском
+        """
+
+        async with async_session(bind=read_router.pick()) as db:
+            rows = ExportRepository(db).stream_key_dates(filters)
+            if export_format == ExportFormat.csv:
+                yield self._csv_chunk([[column.key for column in KEY_DATES_EXPORT_COLUMNS]])
+                async for partition in rows:
+                    yield self._csv_chunk(partition)
+                return
+            async for partition in rows:
+                yield b''.join(dumps(row._asdict()) + b'\n' for row in partition)
+
+    @staticmethod
+    def _csv_chunk(rows) -> bytes:
+        buffer = StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode()
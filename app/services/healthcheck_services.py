@@ -1,3 +1,30 @@
+from typing import List
+
+from app.database import pools
+from app.schema.healthcheck import PoolStatus
+
 
 async def check_service():
     return True
+
+
+async def get_pools_status() -> List[PoolStatus]:
+    """ Состояние пулов соединений API чтения и миграции """
+
+    result = []
+    for name, (engine, settings) in pools.items():
+        pool = engine.sync_engine.pool
+        result.append(PoolStatus(
+            name=name,
+            size=pool.size(),
+            capacity=settings.capacity,
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            checkouts=pool.checkouts,
+            wait_time_total=pool.wait_time_total,
+            wait_time_avg=pool.wait_time_total / pool.checkouts if pool.checkouts else 0,
+            wait_time_max=pool.wait_time_max,
+            timeouts=pool.timeouts,
+        ))
+    return result
@@ -0,0 +1,54 @@
+from operator import attrgetter
+from typing import Dict, Sequence, Optional
+
+from app.model.models import MspProjects, MspTasks, MspLookupTableValues, Project, KeyDates
+
+
+class RowMapper:
+    """
+    Отображение источника MSSQL в целевую модель, собранное один раз из _get_map().
+    Копирование строки - один attrgetter и zip, без обхода __dir__() и корутин.
+
+    expressions - SQL-выражения для атрибутов источника, которые не являются его колонками
+    (например, key_date задачи), чтобы маппер работал и по кортежам из Core select
+    """
+
+    def __init__(self, src_model, dst_model, expressions: Optional[Dict] = None):
+        mapping = src_model._get_map()
+        self.src_model = src_model
+        self.dst_model = dst_model
+        self.src_attrs = tuple(mapping)
+        self.dst_attrs = tuple(mapping.values())
+        self.expressions = expressions or {}
+        self._getter = attrgetter(*self.src_attrs)
+
+    @property
+    def columns(self) -> list:
+        """ Колонки для select в порядке, который ожидает from_row """
+        return [self.expressions.get(attr, getattr(self.src_model, attr, None)) for attr in self.src_attrs]
+
+    @property
+    def labeled_columns(self) -> list:
+        """ Колонки с метками по атрибутам источника: строки результата читаются как объекты источника """
+        return [column.label(attr) for attr, column in zip(self.src_attrs, self.columns)]
+
+    def to_dict(self, obj) -> dict:
+        values = self._getter(obj)
+        if len(self.src_attrs) == 1:
+            values = (values,)
+        return dict(zip(self.dst_attrs, values))
+
+    def from_row(self, row: Sequence) -> dict:
+        return dict(zip(self.dst_attrs, row))
+
+    def create(self, obj, **kwargs):
+        return self.dst_model(**self.to_dict(obj), **kwargs)
+
+    def update(self, dst, obj):
+        for dst_attr, value in self.to_dict(obj).items():
+            setattr(dst, dst_attr, value)
+        return dst
+
+
+project_mapper = RowMapper(MspProjects, Project)
+key_date_mapper = RowMapper(MspTasks, KeyDates, {'key_date': MspLookupTableValues.lt_value_text})
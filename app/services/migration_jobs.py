@@ -0,0 +1,120 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from http import HTTPStatus
+from logging import getLogger
+from typing import Optional, Dict
+from uuid import uuid4, UUID
+
+from app.database import migration_session
+from app.helpers.exception import BaseException, ErrorCode
+from app.helpers.instrumentation import track_queries
+from app.repositories.lock_repositories import advisory_lock
+from app.schema.migration import MigrationParams, MigrationJobState, MigrationJobOut
+from app.services.migration_services import (migrate_data, migrate_data_bulk, migrate_data_parallel,
+                                             MigrationProgress)
+from app.services.snapshot_services import snapshot_after_migration
+
+log = getLogger()
+
+# сколько завершенных задач хранить для GET /migrate/{job_id}
+JOBS_HISTORY_SIZE = 100
+
+
+class MigrationJob:
+    """ Фоновая миграция в процессе сервиса """
+
+    def __init__(self, params: MigrationParams):
+        self.id: UUID = uuid4()
+        self.params = params
+        self.state = MigrationJobState.pending
+        self.progress = MigrationProgress()
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self.results = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.state in (MigrationJobState.pending, MigrationJobState.running)
+
+    async def run(self) -> None:
+        self.state = MigrationJobState.running
+        self.started_at = datetime.now()
+        params = self.params
+        try:
+            with track_queries() as stats:
+                async with migration_session() as db:
+                    async with advisory_lock(db.bind) as locked:
+                        if not locked:
+                            raise RuntimeError(ErrorCode.MIGRATION_IN_PROGRESS.value.message)
+                        if params.parallel:
+                            self.results = await migrate_data_parallel(db, params, self.progress)
+                        elif params.bulk:
+                            await migrate_data_bulk(db, params, self.progress)
+                        else:
+                            await migrate_data(db, params, self.progress)
+                        await snapshot_after_migration(db)
+                log.info('migration job %s: %s', self.id, stats.summary())
+            self.state = MigrationJobState.done
+        except Exception as exc:
+            log.exception('migration job %s failed', self.id)
+            self.state = MigrationJobState.failed
+            self.error = str(exc)
+        finally:
+            self.finished_at = datetime.now()
+
+    def to_schema(self) -> MigrationJobOut:
+        elapsed = 0
+        if self.started_at:
+            elapsed = ((self.finished_at or datetime.now()) - self.started_at).total_seconds()
+        return MigrationJobOut(
+            id=self.id,
+            state=self.state,
+            params=self.params,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            projects_total=self.progress.projects_total,
+            projects_done=self.progress.projects_done,
+            rows_written=self.progress.rows_written,
+            projects_per_second=self.progress.projects_done / elapsed if elapsed else 0,
+            rows_per_second=self.progress.rows_written / elapsed if elapsed else 0,
+            error=self.error,
+            results=self.results,
+        )
+
+
+class MigrationJobManager:
+    """
+    Очередь из одной активной миграции на процесс.
+    Между процессами и инстансами сервиса миграции разводит advisory lock в Postgres.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[UUID, MigrationJob] = OrderedDict()
+
+    @property
+    def active_job(self) -> Optional[MigrationJob]:
+        return next((job for job in self.jobs.values() if job.is_active), None)
+
+    def start(self, params: MigrationParams) -> MigrationJob:
+        if self.active_job:
+            raise BaseException(HTTPStatus.CONFLICT, ErrorCode.MIGRATION_IN_PROGRESS)
+        job = MigrationJob(params)
+        self.jobs[job.id] = job
+        while len(self.jobs) > JOBS_HISTORY_SIZE:
+            self.jobs.popitem(last=False)
+        job.task = asyncio.create_task(job.run())
+        return job
+
+    def get(self, job_id: UUID) -> MigrationJob:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise BaseException(HTTPStatus.NOT_FOUND, ErrorCode.MIGRATION_JOB_NOT_FOUND)
+        return job
+
+
+migration_jobs = MigrationJobManager()
@@ -1,59 +1,69 @@
-import inspect
+import asyncio
 from collections import defaultdict
 from datetime import datetime
+from logging import getLogger
+from typing import AsyncIterator, List, Optional, Dict, Tuple
 
-from app.model.models import Project, BasePlan, KeyDates, Version
-from app.repositories.migration_repositories import MigrationRepository
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 
+from app.database import migration_pool_settings, read_router
+from app.helpers.cache import response_cache
+from app.model.models import BasePlan, KeyDates, Version
+from app.repositories.current_version_repositories import CurrentVersionRepository
+from app.repositories.bulk_repositories import BulkWriteRepository, uuid_key
+from app.repositories.migration_read_repositories import MigrationReadRepository, SourceProject
+from app.repositories.watermark_repositories import WatermarkRepository
+from app.schema.migration import ProjectMigrationResult, MigrationStatus, MigrationParams
+from app.services.diff_services import TaskIndex, current_key_dates
+from app.services.mappers import project_mapper, key_date_mapper
 
-async def set_attr(model, obj):
-    dst = model()
-    for attr in obj.__dir__():
-        mapped = await obj.map(attr)
-        if mapped:
-            dst_attr, value = mapped
-            if inspect.isawaitable(value):
-                result = await value
-                setattr(dst, dst_attr, result)
-            else:
-                setattr(dst, dst_attr, value)
-    return dst
-
-
-async def set_obj_attr(dst, obj):
-    for attr in obj.__dir__():
-        mapped = await obj.map(attr)
-        if mapped:
-            dst_attr, value = mapped
-            if inspect.isawaitable(value):
-                result = await value
-                setattr(dst, dst_attr, result)
-            else:
-                setattr(dst, dst_attr, value)
-    return dst
+log = getLogger()
+
+
+class MigrationProgress:
+    """ Счетчики хода миграции, которые читает фоновая задача """
+
+    def __init__(self):
+        self.projects_total: Optional[int] = None
+        self.projects_done: int = 0
+        self.rows_written: int = 0
+
+    def on_flush(self, session, flush_context) -> None:
+        # в after_flush new/dirty еще содержат записанные объекты
+        self.rows_written += len(session.new) + len(session.dirty)
 
 
-async def create_instance(db, model, obj_src, kwargs) -> None:
-    obj_new = await set_attr(model, obj_src)
-    if kwargs:
-        for key, value in kwargs.items():
-            setattr(obj_new, key, value)
-    db.add(obj_new)
+async def after_commit(project_ids) -> None:
+    """ После коммита миграции: сброс кэша ответов по проектам и окно read-your-writes для чтений """
+
+    read_router.mark_write()
+    await response_cache.invalidate_projects(project_ids)
+
+
+async def create_instance(db, mapper, obj_src, kwargs) -> None:
+    db.add(mapper.create(obj_src, **kwargs))
     await db.flush()
 
 
-async def add_tasks_and_version(db, base_plan_id, project_id, parent_version_id, need_linked_tasks) -> None:
+async def add_tasks_and_version(db, base_plan_id, project_id, parent_version_id, need_linked_tasks,
+                                is_delta: bool = False, removed_key_dates=()) -> None:
     new_version_instance = Version(base_plan_id=base_plan_id, project_id=project_id,
-                                   parent_version_id=parent_version_id)
+                                   parent_version_id=parent_version_id, is_delta=is_delta)
     db.add(new_version_instance)
     await db.flush()
+    await CurrentVersionRepository(db).set_current_versions([(new_version_instance.id, base_plan_id, project_id)])
     kwargs = {
         'project_id': project_id,
         'base_plan_id': base_plan_id,
         'version_id': new_version_instance.id
     }
     for task in need_linked_tasks:
-        await create_instance(db, KeyDates, task, kwargs)
+        await create_instance(db, key_date_mapper, task, kwargs)
+    for key_date in removed_key_dates:
+        db.add(KeyDates(**removed_key_date_row(key_date, datetime.now()), **kwargs))
+    await db.flush()
 
 
 async def add_base_plan_to_project(db, base_lines_dict, project_id) -> None:
@@ -93,88 +103,406 @@ async def add_task_to_base_plan(db, task, base_plan, version) -> None:
         'base_plan_id': base_plan.id,
         'version_id': version.id
     }
-    await create_instance(db, KeyDates, task, kwargs)
+    await create_instance(db, key_date_mapper, task, kwargs)
 
 
-async def migrate_data(db) -> True:
-    repo = MigrationRepository(db)
-    ms_projects = await repo.get_all_projects()
-    for ms_project in ms_projects:
-        project_obj_exist = await repo.check_exists_project(ms_project.proj_uid)
-        if not project_obj_exist:
-            base_lines = [bl for bl in ms_project.base_lines if await bl.task.key_date]
-            if base_lines:
-                project_obj = await set_attr(Project, ms_project)
-                db.add(project_obj)
-                await db.flush()
-                project_id = project_obj.id
-                print(f'new project {project_id = }')
-                base_lines_dict = defaultdict(list)
-                base_lines_created_dates = await get_created_date_dict(base_lines)
-
-                for bl in base_lines:
-                    base_lines_dict[(bl.tb_base_num, base_lines_created_dates.get(bl.tb_base_num))].append(bl.task)
-                await add_base_plan_to_project(db, base_lines_dict, project_id)
-                await db.commit()
-        else:
-            project_id = project_obj_exist.id
-            print(f'exists project {project_id = }')
-            base_lines = [bl for bl in ms_project.base_lines if await bl.task.key_date]
-            base_plans_num = [bp.base_number for bp in project_obj_exist.base_plans]
+async def migrate_project(db, ms_project, project_obj_exist, last_version, chain, main_versions,
+                          delta: bool = False) -> None:
+    """
+    Состояние уже мигрированного проекта (проект с базовыми планами, последняя версия
+    с цепочкой дельта-версий, корневые версии планов) читается заранее на всю порцию - get_exists_state.
+    delta - новая версия хранит только отличия от родительской
+    """
+
+    if not project_obj_exist:
+        base_lines = ms_project.base_lines
+        if base_lines:
+            project_obj = project_mapper.create(ms_project)
+            db.add(project_obj)
+            await db.flush()
+            project_id = project_obj.id
+            log.debug('new project %s', project_id)
             base_lines_dict = defaultdict(list)
             base_lines_created_dates = await get_created_date_dict(base_lines)
-            last_version = await repo.get_base_plan_last_version(project_id)
 
-            # проверяем появление нового базового плана
             for bl in base_lines:
-                base_lines_dict[(bl.tb_base_num, base_lines_created_dates.get(bl.tb_base_num))].append(
-                    bl.task) if bl.tb_base_num not in base_plans_num else None
-            if base_lines_dict:
-                await add_base_plan_to_project(db, base_lines_dict, project_id)
-                await db.flush()
-
-            # проверяем добавление новых тасок в базовый план
-            base_lines_task_dict = defaultdict(list)
-            for bl in base_lines:
-                base_lines_task_dict[bl.tb_base_num].append(bl.task)
-            for base_line_num, base_line_task_list in base_lines_task_dict.items():
-                base_plan = await repo.get_base_plan(project_id, base_line_num)
-                version = await repo.get_base_plan_main_version(project_id, base_plan.id)
-                base_lines_tasks = {task: {'start': task.task_start_date, 'finish': task.task_finish_date}
-                                    for task in base_line_task_list}
-                base_plan_tasks = {str(task.task_uuid): {'start': task.task_start_date, 'finish': task.task_finish_date,
-                                                         'task': task} for task in base_plan.tasks}
-                for task, data in base_lines_tasks.items():
-                    if task.task_uid in base_plan_tasks and\
-                            data.get('start') == base_plan_tasks[task.task_uid].get('start') and\
-                            data.get('finish') == base_plan_tasks[task.task_uid].get('finish'):
-                        continue
-
-                    # привязываем таску созданную в существующем base line к базовому плану
-                    elif task.task_uid not in base_plan_tasks:
-                        await add_task_to_base_plan(db, task, base_plan, version)
-
-                        # если дата в таске поменялась то меняем ее и ключевых датах
-                    else:
-                        updated_task = await set_obj_attr(base_plan_tasks[task.task_uid].get('task'), task)
-                        updated_task.updated_at = datetime.now()
-                        await db.flush()
-
-            # проверяем были ли изменения в текущих тасках и добавление новых - не привязанных к base line
-            linked_tasks_uuid = {str(task.task_uuid): {'start': task.task_start_date, 'finish': task.task_finish_date}
-                                 for task in last_version.tasks}
-
-            need_linked_tasks = {task: {'start': task.task_start_date, 'finish': task.task_finish_date} for task in
-                                 ms_project.tasks if await task.key_date}
-            if need_linked_tasks:
-                for task, dates in need_linked_tasks.items():
-                    if task.task_uid in linked_tasks_uuid and\
-                            dates.get('start') == linked_tasks_uuid[task.task_uid].get('start') and\
-                            dates.get('finish') == linked_tasks_uuid[task.task_uid].get('finish'):
-                        continue
-                    else:
-                        await add_tasks_and_version(db, last_version.base_plan_id, project_id, last_version.id,
-                                                    list(need_linked_tasks))
-                        break
+                base_lines_dict[(bl.tb_base_num, base_lines_created_dates.get(bl.tb_base_num))].append(bl.task)
+            await add_base_plan_to_project(db, base_lines_dict, project_id)
             await db.commit()
+            await after_commit([project_id])
+    else:
+        project_id = project_obj_exist.id
+        log.debug('exists project %s', project_id)
+        base_lines = ms_project.base_lines
+        base_plans = {bp.base_number: bp for bp in project_obj_exist.base_plans}
+        base_plans_num = set(base_plans)
+        base_lines_dict = defaultdict(list)
+        base_lines_created_dates = await get_created_date_dict(base_lines)
+
+        # проверяем появление нового базового плана
+        for bl in base_lines:
+            base_lines_dict[(bl.tb_base_num, base_lines_created_dates.get(bl.tb_base_num))].append(
+                bl.task) if bl.tb_base_num not in base_plans_num else None
+        # кэш ответов сбрасывается, только если проект действительно изменился
+        changed = bool(base_lines_dict)
+        if base_lines_dict:
+            await add_base_plan_to_project(db, base_lines_dict, project_id)
+            await db.flush()
+
+        # проверяем добавление новых тасок в базовый план; только что созданные планы уже со всеми тасками
+        base_lines_task_dict = defaultdict(list)
+        for bl in base_lines:
+            if bl.tb_base_num in base_plans_num:
+                base_lines_task_dict[bl.tb_base_num].append(bl.task)
+        for base_line_num, base_line_task_list in base_lines_task_dict.items():
+            base_plan = base_plans[base_line_num]
+            version = main_versions[base_plan.id]
+            index = TaskIndex(version.tasks)
+            changeset = index.diff(base_line_task_list, with_removed=False)
+            changed = changed or bool(changeset)
+
+            # привязываем таску созданную в существующем base line к базовому плану
+            for task in changeset.added:
+                await add_task_to_base_plan(db, task, base_plan, version)
+
+            # если дата в таске поменялась то меняем ее и ключевых датах
+            for task, key_date in changeset.changed:
+                updated_task = key_date_mapper.update(key_date, task)
+                updated_task.updated_at = datetime.now()
+            await db.flush()
+
+        # проверяем были ли изменения в текущих тасках и добавление новых - не привязанных к base line
+        index = TaskIndex(current_key_dates(last_version, chain))
+        need_linked_tasks = ms_project.tasks
+        changeset = index.diff(need_linked_tasks)
+        if changeset and delta:
+            await add_tasks_and_version(db, last_version.base_plan_id, project_id, last_version.id,
+                                        changeset.added + [task for task, _ in changeset.changed],
+                                        is_delta=True, removed_key_dates=changeset.removed)
+        elif changeset:
+            await add_tasks_and_version(db, last_version.base_plan_id, project_id, last_version.id,
+                                        need_linked_tasks)
+        await db.commit()
+        if changed or changeset:
+            await after_commit([project_id])
+
+
+async def iter_project_chunks(db, params: MigrationParams, proj_uids: Optional[List] = None,
+                              progress: Optional[MigrationProgress] = None) -> AsyncIterator[List[SourceProject]]:
+    """
+    Проекты MSSQL порциями по params.chunk_size, только с тасками - ключевыми датами.
+    params.stream - читать список проектов серверным курсором в отдельной сессии:
+    в памяти одновременно только одна порция, поэтому она не зависит от общего числа проектов
+    proj_uids - читать только указанные проекты
+    progress - сюда записывается общее число проектов
+    """
+
+    progress = progress or MigrationProgress()
+    read_repo = MigrationReadRepository(db)
+    if not params.stream:
+        project_rows = await read_repo.get_all_projects(proj_uids)
+        progress.projects_total = len(project_rows)
+        for chunk_start in range(0, len(project_rows), params.chunk_size):
+            yield await read_repo.get_source_projects(project_rows[chunk_start:chunk_start + params.chunk_size],
+                                                      params.key_date_field_uid, params.key_date_lcid)
+        return
+
+    async with AsyncSession(db.bind, expire_on_commit=False) as read_db:
+        stream_repo = MigrationReadRepository(read_db)
+        progress.projects_total = await stream_repo.count_projects(proj_uids)
+        async for project_rows in stream_repo.stream_projects(params.chunk_size, proj_uids):
+            yield await read_repo.get_source_projects(project_rows, params.key_date_field_uid,
+                                                      params.key_date_lcid)
+
+
+async def get_changed_projects(db, params: MigrationParams) -> Tuple[Optional[List[str]], Dict]:
+    """
+    Проекты, изменившиеся в MSSQL с прошлой миграции, и их новые отметки.
+    Список uuid равен None, если изменились все проекты (первая миграция)
+    """
+
+    source_watermarks = await MigrationReadRepository(db).get_source_watermarks(params.key_date_field_uid,
+                                                                                params.key_date_lcid)
+    watermarks = await WatermarkRepository(db).get_watermarks()
+    changed = {project_uuid: watermark for project_uuid, watermark in source_watermarks.items()
+               if watermarks.get(project_uuid) != watermark}
+    proj_uids = None if len(changed) == len(source_watermarks) else list(changed)
+    return proj_uids, changed
+
+
+async def save_chunk_watermarks(db, ms_projects, watermarks: Dict) -> None:
+    """ Отметки обработанной порции пишутся в ее же транзакции """
+
+    chunk_watermarks = {}
+    for ms_project in ms_projects:
+        project_uuid = uuid_key(ms_project.proj_uid)
+        if project_uuid in watermarks:
+            chunk_watermarks[project_uuid] = watermarks[project_uuid]
+    await WatermarkRepository(db).save_watermarks(chunk_watermarks)
+
+
+async def migrate_data(db, params: Optional[MigrationParams] = None,
+                       progress: Optional[MigrationProgress] = None) -> True:
+    """
+    params.incremental - мигрировать только проекты, изменившиеся с прошлой миграции
+    params.delta - новые версии хранят только отличия от родительской
+    """
+
+    read_repo = MigrationReadRepository(db)
+    params = params or MigrationParams()
+    progress = progress or MigrationProgress()
+    proj_uids, watermarks = None, {}
+    if params.incremental:
+        proj_uids, watermarks = await get_changed_projects(db, params)
+        if not watermarks:
+            return True
+    event.listen(db.sync_session, 'after_flush', progress.on_flush)
+    try:
+        async for ms_projects in iter_project_chunks(db, params, proj_uids, progress):
+            exists_projects, last_versions, chains, main_versions = await get_exists_state(read_repo, ms_projects)
+            for ms_project in ms_projects:
+                project_obj_exist = exists_projects.get(uuid_key(ms_project.proj_uid))
+                last_version = last_versions.get(project_obj_exist.id) if project_obj_exist else None
+                await migrate_project(db, ms_project, project_obj_exist, last_version,
+                                      chains.get(last_version.id) if last_version else None, main_versions,
+                                      params.delta)
+                progress.projects_done += 1
+            if params.incremental:
+                await save_chunk_watermarks(db, ms_projects, watermarks)
+                await db.commit()
+            db.expunge_all()
+    finally:
+        event.remove(db.sync_session, 'after_flush', progress.on_flush)
+    return True
+
+
+async def get_exists_state(read_repo, batch) -> Tuple[Dict, Dict, Dict, Dict]:
+    """
+    Состояние уже мигрированных проектов порции по запросу на связь, а не на проект:
+    проекты с базовыми планами по uuid, последние версии и их цепочки дельта-версий,
+    корневые версии базовых планов с их ключевыми датами
+    """
+
+    exists_projects = await read_repo.get_exists_projects([ms_project.proj_uid for ms_project in batch])
+    project_ids = [project.id for project in exists_projects.values()]
+    last_versions = await read_repo.get_last_versions(project_ids)
+    chains = await read_repo.get_delta_chains(last_versions.values())
+    main_versions = await read_repo.get_main_versions(
+        [bp.id for project in exists_projects.values() for bp in project.base_plans])
+    return exists_projects, last_versions, chains, main_versions
+
+
+def project_row(ms_project) -> dict:
+    return {**project_mapper.to_dict(ms_project), 'is_active': True}
+
+
+def key_date_row(task, now) -> dict:
+    return {**key_date_mapper.to_dict(task), 'updated_at': now, 'is_removed': False}
+
+
+def removed_key_date_row(key_date, now) -> dict:
+    """ Отметка удаления таски в дельта-версии """
+
+    return {
+        'name': key_date.name,
+        'task_start_date': key_date.task_start_date,
+        'task_finish_date': key_date.task_finish_date,
+        'task_uuid': key_date.task_uuid,
+        'task_name': key_date.task_name,
+        'updated_at': now,
+        'is_removed': True,
+    }
+
+
+async def plan_base_plans(writer, base_lines_dict, now, project_id=None, project_uuid=None) -> None:
+    """ Новые базовые планы с первой версией и ключевыми датами """
+
+    for (base_number, created_at), task_list in base_lines_dict.items():
+        writer.add_base_plan({
+            'created_at': created_at,
+            'base_number': base_number,
+            'project_id': project_id,
+            'base_plan_start_date': min(task.task_start_date for task in task_list),
+            'base_plan_finish_date': max(task.task_finish_date for task in task_list),
+            'updated_at': now,
+        }, project_uuid=project_uuid)
+        writer.add_version({
+            'migration_date': now,
+            'base_plan_id': None,
+            'project_id': project_id,
+            'parent_version_id': None,
+            'is_delta': False,
+        }, project_uuid=project_uuid, base_number=base_number)
+        writer.add_key_dates([key_date_row(task, now) for task in task_list],
+                             project_id=project_id, project_uuid=project_uuid, base_number=base_number)
+
+
+async def plan_new_project(writer, ms_project, base_lines, now) -> None:
+    writer.add_project(project_row(ms_project))
+    base_lines_dict = defaultdict(list)
+    base_lines_created_dates = await get_created_date_dict(base_lines)
+    for bl in base_lines:
+        base_lines_dict[(bl.tb_base_num, base_lines_created_dates.get(bl.tb_base_num))].append(bl.task)
+    await plan_base_plans(writer, base_lines_dict, now, project_uuid=ms_project.proj_uid)
+
+
+async def plan_exists_project(writer, ms_project, project_obj_exist, base_lines, last_version, chain,
+                              main_versions, now, delta: bool = False) -> None:
+    project_id = project_obj_exist.id
+    base_plans = {bp.base_number: bp for bp in project_obj_exist.base_plans}
+    base_plans_num = set(base_plans)
+    base_lines_created_dates = await get_created_date_dict(base_lines)
+
+    # новые базовые планы
+    base_lines_dict = defaultdict(list)
+    for bl in base_lines:
+        if bl.tb_base_num not in base_plans_num:
+            base_lines_dict[(bl.tb_base_num, base_lines_created_dates.get(bl.tb_base_num))].append(bl.task)
+    await plan_base_plans(writer, base_lines_dict, now, project_id=project_id)
+
+    # новые и измененные таски существующих базовых планов
+    base_lines_task_dict = defaultdict(list)
+    for bl in base_lines:
+        if bl.tb_base_num in base_plans_num:
+            base_lines_task_dict[bl.tb_base_num].append(bl.task)
+    for base_line_num, base_line_task_list in base_lines_task_dict.items():
+        base_plan = base_plans[base_line_num]
+        version = main_versions[base_plan.id]
+        index = TaskIndex(version.tasks)
+        changeset = index.diff(base_line_task_list, with_removed=False)
+        # изменения существующих строк уходят одним executemany при flush сессии
+        for task, key_date in changeset.changed:
+            key_date_mapper.update(key_date, task)
+            key_date.updated_at = now
+        if changeset.changed:
+            writer.mark_project(project_id)
+        if changeset.added:
+            base_plan.updated_at = now
+            writer.add_key_dates([key_date_row(task, now) for task in changeset.added],
+                                 project_id=project_id, base_plan_id=base_plan.id, version_id=version.id)
+
+    # изменения в текущих тасках - новая версия со всеми ключевыми датами проекта или только с отличиями
+    index = TaskIndex(current_key_dates(last_version, chain))
+    need_linked_tasks = ms_project.tasks
+    changeset = index.diff(need_linked_tasks)
+    if not changeset:
+        return
+    writer.add_version({
+        'migration_date': now,
+        'base_plan_id': last_version.base_plan_id,
+        'project_id': project_id,
+        'parent_version_id': last_version.id,
+        'is_delta': delta,
+    })
+    if delta:
+        rows = [key_date_row(task, now) for task in changeset.added]
+        rows += [key_date_row(task, now) for task, _ in changeset.changed]
+        rows += [removed_key_date_row(key_date, now) for key_date in changeset.removed]
+    else:
+        rows = [key_date_row(task, now) for task in need_linked_tasks]
+    writer.add_key_dates(rows, project_id=project_id, base_plan_id=last_version.base_plan_id)
+
+
+async def plan_batch(read_repo, writer, batch, now, delta: bool = False) -> Dict[str, MigrationStatus]:
+    """ Планирует в writer запись порции проектов """
+
+    exists_projects, last_versions, chains, main_versions = await get_exists_state(read_repo, batch)
+    statuses = {}
+    for ms_project in batch:
+        project_uuid = uuid_key(ms_project.proj_uid)
+        base_lines = ms_project.base_lines
+        project_obj_exist = exists_projects.get(project_uuid)
+        if not project_obj_exist:
+            if base_lines:
+                await plan_new_project(writer, ms_project, base_lines, now)
+                statuses[project_uuid] = MigrationStatus.created
+            else:
+                statuses[project_uuid] = MigrationStatus.skipped
+        else:
+            last_version = last_versions.get(project_obj_exist.id)
+            await plan_exists_project(writer, ms_project, project_obj_exist, base_lines, last_version,
+                                      chains.get(last_version.id), main_versions, now, delta)
+            statuses[project_uuid] = MigrationStatus.updated
+    return statuses
+
+
+async def migrate_data_bulk(db, params: Optional[MigrationParams] = None,
+                            progress: Optional[MigrationProgress] = None) -> True:
+    """
+    Миграция порциями проектов: строки копятся в памяти и пишутся
+    многострочными INSERT ... RETURNING, по несколько запросов на порцию
+    """
+
+    read_repo = MigrationReadRepository(db)
+    writer = BulkWriteRepository(db)
+    params = params or MigrationParams()
+    progress = progress or MigrationProgress()
+    proj_uids, watermarks = None, {}
+    if params.incremental:
+        proj_uids, watermarks = await get_changed_projects(db, params)
+        if not watermarks:
+            return True
+    async for batch in iter_project_chunks(db, params, proj_uids, progress):
+        await plan_batch(read_repo, writer, batch, datetime.now(), params.delta)
+        progress.rows_written += await writer.flush()
+        progress.projects_done += len(batch)
+        if params.incremental:
+            await save_chunk_watermarks(db, batch, watermarks)
+        await db.commit()
+        await after_commit(writer.pop_project_ids())
+        db.expunge_all()
     return True
+
+
+async def migrate_project_isolated(session_maker, semaphore, ms_project, params: MigrationParams,
+                                   watermarks: Dict, progress: MigrationProgress) -> ProjectMigrationResult:
+    """ Миграция одного проекта в собственной сессии и транзакции """
+
+    project_uuid = uuid_key(ms_project.proj_uid)
+    async with semaphore:
+        async with session_maker() as db:
+            try:
+                writer = BulkWriteRepository(db)
+                statuses = await plan_batch(MigrationReadRepository(db), writer, [ms_project], datetime.now(),
+                                            params.delta)
+                rows_count = await writer.flush()
+                if watermarks:
+                    await save_chunk_watermarks(db, [ms_project], watermarks)
+                await db.commit()
+                await after_commit(writer.pop_project_ids())
+            except Exception as exc:
+                await db.rollback()
+                log.exception('migration of project %s failed', project_uuid)
+                return ProjectMigrationResult(proj_uid=project_uuid, status=MigrationStatus.failed, error=str(exc))
+            finally:
+                progress.projects_done += 1
+    progress.rows_written += rows_count
+    return ProjectMigrationResult(proj_uid=project_uuid, status=statuses[project_uuid])
+
+
+async def migrate_data_parallel(db, params: Optional[MigrationParams] = None,
+                                progress: Optional[MigrationProgress] = None) -> List[ProjectMigrationResult]:
+    """
+    Параллельная миграция: каждый проект в своей сессии и транзакции,
+    одновременно не больше params.concurrency проектов (и не больше, чем позволяет пул).
+    Ошибка проекта не прерывает миграцию остальных
+    """
+
+    params = params or MigrationParams()
+    progress = progress or MigrationProgress()
+    # соединения уже заняты сессией запроса, блокировкой миграции и, при stream, сессией чтения
+    concurrency = max(1, min(params.concurrency, migration_pool_settings.capacity - (3 if params.stream else 2)))
+    semaphore = asyncio.Semaphore(concurrency)
+    session_maker = sessionmaker(bind=db.bind, class_=AsyncSession, autocommit=False, autoflush=False,
+                                 expire_on_commit=False)
+    proj_uids, watermarks = None, {}
+    if params.incremental:
+        proj_uids, watermarks = await get_changed_projects(db, params)
+        if not watermarks:
+            return []
+    results = []
+    async for batch in iter_project_chunks(db, params, proj_uids, progress):
+        results.extend(await asyncio.gather(
+            *(migrate_project_isolated(session_maker, semaphore, ms_project, params, watermarks, progress)
+              for ms_project in batch)))
+    return results
@@ -34,7 +34,7 @@ class Baselines(MigrationBase):
         super().__init__()
 
     def get_baselines(self):
-        return [bl for bl in self.ms_project.base_lines if await bl.task.key_date]
+        return [bl for bl in self.ms_project.base_lines if bl.task.key_date]
 
     async def get_created_date_dict(self, base_lines):
         base_lines_created_date_dict = dict()
@@ -1,21 +1,59 @@
-from typing import List
+from typing import List, Optional
 
+from pydantic.tools import parse_obj_as
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_async_session
+from app.database import get_read_session
 from fastapi import Depends
 
-from app.repositories.project_repositories import ProjectRepository
-from app.schema.project import ProjectBase
+from app.helpers.etag import make_etag
+from app.repositories.current_version_repositories import CurrentVersionRepository
+from app.repositories.project_list_repositories import ProjectListRepository
+from app.repositories.state_repositories import StateRepository
+from app.schema.base import PaginationParams
+from app.schema.key_dates import KeyDatesBase
+from app.schema.project import ProjectBase, ProjectFilter, ProjectPage
 
 
 class ProjectService:
 
-    def __init__(self, db: AsyncSession = Depends(get_async_session)):
-        self.repo = ProjectRepository(db)
+    def __init__(self, db: AsyncSession = Depends(get_read_session)):
+        self.list_repo = ProjectListRepository(db)
+        self.state_repo = StateRepository(db)
+        self.current_repo = CurrentVersionRepository(db)
 
-    async def get_projects(self) -> List[ProjectBase]:
+    async def get_projects_page(self, filters: ProjectFilter, pagination: PaginationParams,
+                                after_id: Optional[int] = None) -> ProjectPage:
 
-        """ Отдает проекты """
+        """ Отдает страницу проектов с общим числом под фильтром """
 
-        return await self.repo.get_all_projects()
+        projects, total_count = await self.list_repo.get_projects_page(filters, pagination, after_id)
+        return ProjectPage(
+            page=pagination.page,
+            max_per_page=pagination.max_per_page,
+            total_count=total_count,
+            after_id=after_id,
+            next_after_id=projects[-1].id if len(projects) == pagination.max_per_page else None,
+            items=[ProjectBase.from_orm(project) for project in projects],
+        )
+
+    async def get_etag(self, filters: ProjectFilter, pagination: PaginationParams,
+                       after_id: Optional[int] = None) -> str:
+
+        """ ETag страницы проектов по агрегату состояния всех проектов, без построения самой страницы """
+
+        state = await self.state_repo.get_projects_state()
+        return make_etag('projects', filters.json(), pagination.json(), after_id, *state)
+
+    async def get_key_dates_etag(self, project_id: int) -> str:
+
+        """ ETag ключевых дат по агрегату состояния проекта, без чтения самих дат """
+
+        state = await self.state_repo.get_project_state(project_id)
+        return make_etag('key_dates', project_id, *state)
+
+    async def get_current_key_dates(self, project_id: int) -> List[KeyDatesBase]:
+
+        """ Ключевые даты последней версии проекта; дельта-версия собирается по цепочке в БД """
+
+        return parse_obj_as(List[KeyDatesBase], await self.current_repo.get_current_key_dates(project_id))
@@ -0,0 +1,135 @@
+""" Колоночные снимки отчетной схемы
+
+    python -m app.services.snapshot_services [--format parquet|arrow] [--current-only] [directory]
+"""
+import argparse
+import asyncio
+import os
+from logging import getLogger
+from tempfile import mkstemp
+from typing import Optional
+
+from sqlalchemy import Integer, String, DateTime, Boolean
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import migration_session
+from app.repositories.snapshot_repositories import SnapshotRepository, SNAPSHOT_TABLES
+from app.schema.snapshot import SnapshotSettings, SnapshotFormat, SnapshotOut, SnapshotFile
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # снимки требуют pyarrow, остальной сервис работает без него
+    pyarrow = None
+
+log = getLogger()
+
+snapshot_settings = SnapshotSettings()
+
+
+def arrow_type(column):
+    if isinstance(column.type, UUID):
+        return pyarrow.string()
+    if isinstance(column.type, Boolean):
+        return pyarrow.bool_()
+    if isinstance(column.type, Integer):
+        return pyarrow.int64()
+    if isinstance(column.type, DateTime):
+        return pyarrow.timestamp('us')
+    if isinstance(column.type, String):
+        return pyarrow.string()
+    raise TypeError(f'no arrow type for column {column}')
+
+
+def arrow_schema(table):
+    return pyarrow.schema([pyarrow.field(column.name, arrow_type(column), nullable=column.nullable)
+                           for column in table.columns])
+
+
+class SnapshotWriter:
+    """ Запись record batch в файл Parquet или Arrow IPC """
+
+    def __init__(self, path: str, schema, snapshot_format: SnapshotFormat):
+        self.schema = schema
+        if snapshot_format == SnapshotFormat.parquet:
+            self.writer = pyarrow.parquet.ParquetWriter(path, schema)
+        else:
+            self.writer = pyarrow.ipc.new_file(path, schema)
+
+    def write(self, columns: dict) -> None:
+        for field in self.schema:
+            if pyarrow.types.is_string(field.type):
+                columns[field.name] = [None if value is None else str(value) for value in columns[field.name]]
+        self.writer.write_batch(pyarrow.RecordBatch.from_pydict(columns, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+async def write_snapshot(db, directory: str, snapshot_format: SnapshotFormat = SnapshotFormat.parquet,
+                         current_only: bool = False) -> SnapshotOut:
+    """
+    Снимок таблиц project, base_plan, version, key_dates: по файлу на таблицу.
+    Строки читаются серверным курсором и пишутся по record batch, в памяти одна порция.
+    Файл пишется во временный с уникальным именем и подменяет прежний целиком: читатели не видят
+    недописанный снимок, одновременные снимки не пишут в один файл, а при ошибке временный файл удаляется
+    current_only - только текущие версии (с цепочками дельта-версий) и их ключевые даты
+    """
+
+    if pyarrow is None:
+        raise RuntimeError('snapshots require pyarrow')
+    os.makedirs(directory, exist_ok=True)
+    repo = SnapshotRepository(db)
+    files = []
+    for table in SNAPSHOT_TABLES:
+        path = os.path.join(directory, f'{table.name}.{snapshot_format.value}')
+        fd, tmp_path = mkstemp(dir=directory, prefix=f'.{table.name}.', suffix='.tmp')
+        os.close(fd)
+        try:
+            writer = SnapshotWriter(tmp_path, arrow_schema(table), snapshot_format)
+            rows = 0
+            try:
+                async for columns in repo.stream_table(table, current_only):
+                    rows += len(columns['id'])
+                    await asyncio.to_thread(writer.write, columns)
+            finally:
+                writer.close()
+            os.chmod(tmp_path, 0o644)  # mkstemp создает файл только для владельца
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        files.append(SnapshotFile(table=table.name, path=path, rows=rows))
+    return SnapshotOut(directory=directory, format=snapshot_format, current_only=current_only, files=files)
+
+
+async def snapshot_after_migration(db) -> Optional[SnapshotOut]:
+    """ Снимок по настройкам после успешной миграции; ошибка снимка не роняет миграцию """
+
+    if not (snapshot_settings.after_migration and snapshot_settings.directory):
+        return None
+    try:
+        return await write_snapshot(db, snapshot_settings.directory, snapshot_settings.format,
+                                    snapshot_settings.current_only)
+    except Exception:
+        log.exception('snapshot after migration failed')
+        return None
+
+
+async def main(directory: str, snapshot_format: SnapshotFormat, current_only: bool) -> None:
+    async with migration_session() as db:
+        snapshot = await write_snapshot(db, directory, snapshot_format, current_only)
+    for file in snapshot.files:
+        print(f'{file.table:<12} {file.rows:>12} rows  {file.path}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('directory', nargs='?', default=snapshot_settings.directory)
+    parser.add_argument('--format', type=SnapshotFormat, default=snapshot_settings.format)
+    parser.add_argument('--current-only', action='store_true', default=snapshot_settings.current_only)
+    args = parser.parse_args()
+    if not args.directory:
+        parser.error('directory is required (or set SNAPSHOT_DIRECTORY)')
+    asyncio.run(main(args.directory, args.format, args.current_only))
@@ -0,0 +1,208 @@
+""" Нагрузочный тест API чтения: задержки p50/p95/p99, пропускная способность и запросов к БД на запрос
+
+    python -m benchmarks.api --dsn postgresql+asyncpg://... [--concurrency 1,8,32] [--requests N]
+                             [--endpoints ping,projects,baselines] [--url http://host:port]
+                             [--populate --projects N --tasks N ...] [--no-cache] [--json result.json]
+
+Приложение в процессе работает с базой --dsn вместо базы из настроек (реплики чтения
+в окружении бенчмарка не задаются).
+По умолчанию оно вызывается через ASGI-транспорт httpx, и запросы к БД считаются событиями engine.
+С --url нагрузка идет по сети на запущенный сервис, который должен смотреть в ту же базу
+(запросы к БД при этом не считаются).
+--populate пересоздает зеркало MSSQL и целевые таблицы в базе --dsn и заполняет их
+миграцией синтетических данных, поэтому DSN задается явно, а не берется из настроек
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from statistics import quantiles
+from timeit import default_timer
+from typing import List, Optional, Callable
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.helpers.cache import response_cache
+from app.model.models import Project
+from app.schema.migration import MigrationParams
+from app.settings import db_settings
+from benchmarks.fixtures import add_scale_arguments, scale_from_args, populate
+
+API_PREFIX = '/api/grp_reporter'
+
+ENDPOINTS = {
+    'ping': lambda project_id: f'{API_PREFIX}/ping/',
+    'projects': lambda project_id: f'{API_PREFIX}/project/?page=1&max_per_page=10',
+    'baselines': lambda project_id: f'{API_PREFIX}/baselines/?project_id={project_id}',
+    'key_dates': lambda project_id: f'{API_PREFIX}/project/{project_id}/key_dates',
+}
+
+
+@dataclass
+class LevelResult:
+    endpoint: str
+    concurrency: int
+    requests: int
+    errors: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    requests_per_second: float
+    queries_per_request: Optional[float]
+
+
+class QueryCounter:
+    """ Запросы к БД во всех engine приложения (API, миграция, реплики) """
+
+    def __init__(self):
+        from app.database import pools
+        from benchmarks.migration import StatementCounter
+
+        self.counters = [StatementCounter(engine) for engine, _ in pools.values()]
+
+    @property
+    def count(self) -> int:
+        return sum(counter.count for counter in self.counters)
+
+    def __enter__(self):
+        for counter in self.counters:
+            counter.__enter__()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for counter in self.counters:
+            counter.__exit__(*exc)
+
+
+async def populate_database(args) -> None:
+    """ Синтетическое зеркало MSSQL и его пакетная миграция в базу --dsn """
+
+    from benchmarks.migration import reset_target_tables, run_migration
+
+    engine = create_async_engine(args.dsn)
+    try:
+        await populate(engine, scale_from_args(args))
+        await reset_target_tables(engine)
+        await run_migration(engine, 'seed', 'bulk', MigrationParams(bulk=True), trace_memory=False)
+    finally:
+        await engine.dispose()
+
+
+async def get_project_ids(limit: int = 100) -> List[int]:
+    from app.database import async_session
+
+    async with async_session() as db:
+        entry = await db.execute(select(Project.id).order_by(Project.id).limit(limit))
+        return list(entry.scalars().all())
+
+
+async def run_level(client: httpx.AsyncClient, endpoint: str, path: Callable[[int], str], project_ids: List[int],
+                    concurrency: int, requests: int, count_queries: bool) -> LevelResult:
+    timings, errors = [], 0
+    issued = 0
+
+    async def worker() -> None:
+        nonlocal issued, errors
+        while issued < requests:
+            project_id = project_ids[issued % len(project_ids)] if project_ids else 0
+            issued += 1
+            started = default_timer()
+            try:
+                response = await client.get(path(project_id))
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            timings.append(default_timer() - started)
+
+    counter = QueryCounter() if count_queries else None
+    started = default_timer()
+    if counter:
+        with counter:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+    else:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = default_timer() - started
+
+    percentiles = quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+    return LevelResult(
+        endpoint=endpoint,
+        concurrency=concurrency,
+        requests=len(timings),
+        errors=errors,
+        p50_ms=percentiles[49] * 1e3,
+        p95_ms=percentiles[94] * 1e3,
+        p99_ms=percentiles[98] * 1e3,
+        requests_per_second=len(timings) / elapsed if elapsed else 0,
+        queries_per_request=counter.count / len(timings) if counter and timings else None,
+    )
+
+
+def report(result: LevelResult) -> None:
+    queries = f'{result.queries_per_request:6.1f} q/req' if result.queries_per_request is not None else ''
+    print(f'{result.endpoint:<10} c={result.concurrency:<4} {result.requests:>7} req {result.errors:>5} err '
+          f'p50 {result.p50_ms:8.2f} ms p95 {result.p95_ms:8.2f} ms p99 {result.p99_ms:8.2f} ms '
+          f'{result.requests_per_second:9.0f} req/s {queries}')
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args) -> List[LevelResult]:
+    # engine приложения создаются при импорте app.database по db_settings, поэтому DSN подменяется до него
+    db_settings.dsn = args.dsn
+
+    if args.populate:
+        await populate_database(args)
+    response_cache.enabled = not args.no_cache
+    project_ids = await get_project_ids()
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        from app.instances import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://benchmark',
+                                   timeout=args.timeout)
+
+    results = []
+    async with client:
+        for endpoint in args.endpoints.split(','):
+            # прогрев: соединения пула, кэши statements и ответов
+            await run_level(client, endpoint, ENDPOINTS[endpoint], project_ids, 1, args.warmup, False)
+            for concurrency in map(int, args.concurrency.split(',')):
+                results.append(await run_level(client, endpoint, ENDPOINTS[endpoint], project_ids,
+                                               concurrency, args.requests, not args.url))
+                report(results[-1])
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({
+                'revision': git_revision(),
+                'created_at': datetime.now().isoformat(),
+                'target': args.url or 'asgi',
+                'cache': not args.no_cache,
+                'results': [asdict(result) for result in results],
+            }, file, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', default='1,8,32', help='уровни конкурентности через запятую')
+    parser.add_argument('--requests', type=int, default=500, help='запросов на уровень')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--endpoints', default='ping,projects,baselines')
+    parser.add_argument('--url', help='адрес запущенного сервиса вместо вызова в процессе')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--no-cache', action='store_true', help='без кэша ответов (только в процессе)')
+    parser.add_argument('--json', help='файл для результатов в JSON')
+    parser.add_argument('--populate', action='store_true', help='заполнить базу --dsn синтетическими данными')
+    add_scale_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
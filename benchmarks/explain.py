@@ -0,0 +1,74 @@
+""" Ручная диагностика планов горячих запросов чтения и миграции
+
+    python -m benchmarks.explain [project_id]
+
+Не тест: запускается вручную против базы из настроек, в CI не входит.
+Каждый запрос разбирается EXPLAIN (FORMAT JSON) с enable_seqscan = off - так видно,
+есть ли для пути доступа индекс, независимо от объема данных в базе.
+Код возврата 1, если по таблицам project, base_plan, version или key_dates остался Seq Scan
+"""
+import asyncio
+import json
+import sys
+
+from sqlalchemy import select, func, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import build_connect_args
+from app.model.models import BasePlan, Version, KeyDates
+from app.repositories.base_line_repositories import BASE_PLAN_COLUMNS, VERSION_COLUMNS, KEY_DATE_COLUMNS
+from app.settings import db_settings
+
+TABLES = {'project', 'base_plan', 'version', 'key_dates'}
+
+
+def hot_queries(project_id: int) -> dict:
+    base_plan_ids = select(BasePlan.id).where(BasePlan.project_id == project_id).scalar_subquery()
+    version_ids = select(Version.id).where(Version.project_id == project_id).scalar_subquery()
+    return {
+        'base plans by project': select(*BASE_PLAN_COLUMNS).where(BasePlan.project_id == project_id),
+        'base plan by number': select(BasePlan.id).where(BasePlan.project_id == project_id,
+                                                         BasePlan.base_number == 1),
+        'versions by base plans': select(*VERSION_COLUMNS).where(Version.base_plan_id.in_(base_plan_ids)),
+        'last version of project': select(func.max(Version.id)).where(Version.project_id == project_id),
+        'main version of base plan': select(func.min(Version.id)).where(Version.base_plan_id.in_(base_plan_ids),
+                                                                        Version.parent_version_id.is_(None)),
+        'key dates by version': select(*KEY_DATE_COLUMNS).where(KeyDates.version_id.in_(version_ids)),
+        'key dates by base plan': select(*KEY_DATE_COLUMNS).where(KeyDates.base_plan_id.in_(base_plan_ids)),
+        'key dates by task': select(KeyDates.id).where(KeyDates.task_uuid == '00000000-0000-0000-0000-000000000000'),
+        'key dates state': select(func.max(KeyDates.updated_at)).where(KeyDates.project_id == project_id),
+    }
+
+
+def seq_scans(plan: dict) -> list:
+    """ Таблицы, которые узлы плана читают последовательным сканированием """
+
+    found = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in TABLES:
+        found.append(plan['Relation Name'])
+    for child in plan.get('Plans', ()):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def main(project_id: int) -> int:
+    engine = create_async_engine(db_settings.dsn, connect_args=build_connect_args(db_settings))
+    failed = 0
+    try:
+        async with engine.connect() as connection:
+            await connection.execute(text('SET enable_seqscan = off'))
+            for name, query in hot_queries(project_id).items():
+                compiled = query.compile(engine.sync_engine, compile_kwargs={'literal_binds': True})
+                entry = await connection.execute(text(f'EXPLAIN (FORMAT JSON) {compiled}'))
+                plan = entry.scalar()
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                tables = seq_scans(plan[0]['Plan'])
+                failed += bool(tables)
+                print(f'{name:<28} {"SEQ SCAN " + ", ".join(tables) if tables else "index"}')
+    finally:
+        await engine.dispose()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1)))
@@ -0,0 +1,205 @@
+""" Синтетическое зеркало MSSQL (схема mssql) для бенчмарков миграции
+
+    python -m benchmarks.fixtures --dsn postgresql+asyncpg://... [--projects N] [--tasks N] [--baselines N]
+                                  [--key-date-ratio R] [--seed N]
+
+Таблицы зеркала пересоздаются в указанной базе, поэтому DSN задается явно, а не берется из настроек.
+Нужен Postgres: миграция использует его диалект (INSERT ... ON CONFLICT, DISTINCT ON, advisory locks)
+"""
+import argparse
+import asyncio
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Dict, Iterable
+from uuid import UUID as PyUUID
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, insert, select, update, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.model.models import (Base, MspProjects, MspTasks, MspTaskBaselines, MspTaskCustomFieldsValues,
+                              MspLookupTableValues, KEY_DATE_FIELD_UID, KEY_DATE_LCID)
+from app.repositories.bulk_repositories import chunked
+
+MSSQL_SCHEMA = 'mssql'
+SITE_ID = '00000000-0000-0000-0000-000000000001'
+START = datetime(2022, 1, 10)
+
+
+@dataclass
+class FixtureScale:
+    projects: int = 100
+    tasks: int = 200             # тасок в проекте
+    baselines: int = 3           # базовых планов в проекте
+    key_date_ratio: float = 0.2  # доля тасок с ключевой датой
+    key_date_values: int = 20    # значений в справочнике ключевых дат
+    seed: int = 1
+
+
+def pg_type(column):
+    """ Типы MSSQL (DATETIME, NVARCHAR, CHAR) заменяются ближайшими типами Postgres """
+
+    if isinstance(column.type, UUID):
+        return UUID()
+    if isinstance(column.type, DateTime):
+        return DateTime()
+    if isinstance(column.type, String):
+        return String()
+    if isinstance(column.type, Integer):
+        return Integer()
+    raise TypeError(f'no postgres type for column {column}')
+
+
+def mirror_metadata() -> MetaData:
+    """ Таблицы схемы mssql по моделям, без внешних ключей: в зеркале их нет """
+
+    metadata = MetaData()
+    for table in Base.metadata.tables.values():
+        if table.schema == MSSQL_SCHEMA:
+            Table(table.name, metadata,
+                  *[Column(column.name, pg_type(column), primary_key=column.primary_key) for column in table.columns],
+                  schema=MSSQL_SCHEMA)
+    return metadata
+
+
+class FixtureGenerator:
+    """ Детерминированные (по seed) строки зеркала MSSQL заданного масштаба """
+
+    def __init__(self, scale: FixtureScale):
+        self.scale = scale
+        self.rng = random.Random(scale.seed)
+        self.lookup_values = [self.uuid() for _ in range(scale.key_date_values)]
+
+    def uuid(self) -> str:
+        return str(PyUUID(int=self.rng.getrandbits(128), version=4))
+
+    def lookup_rows(self) -> List[Dict]:
+        return [{'SiteId': SITE_ID, 'LCID': KEY_DATE_LCID, 'LT_STRUCT_UID': lt_struct_uid, 'LT_VALUE_TEXT': f'КД {i}'}
+                for i, lt_struct_uid in enumerate(self.lookup_values)]
+
+    def task_rows(self, proj_uid: str, count: int, offset: int = 0) -> Dict[str, List[Dict]]:
+        """ Таски проекта, ключевые даты части из них и строки базовых планов по всем таскам """
+
+        rows = {'tasks': [], 'custom_fields': [], 'baselines': []}
+        for i in range(offset, offset + count):
+            task_uid = self.uuid()
+            start = START + timedelta(days=self.rng.randint(0, 365))
+            finish = start + timedelta(days=self.rng.randint(1, 90))
+            rows['tasks'].append({'SiteId': 1, 'TASK_UID': task_uid, 'PROJ_UID': proj_uid,
+                                  'TASK_NAME': f'Task {i}', 'TASK_START_DATE': start, 'TASK_FINISH_DATE': finish})
+            if self.rng.random() < self.scale.key_date_ratio:
+                rows['custom_fields'].append({
+                    'SiteId': SITE_ID, 'CUSTOM_FIELD_UID': self.uuid(), 'TASK_UID': task_uid, 'PROJ_UID': proj_uid,
+                    'MD_PROP_UID': KEY_DATE_FIELD_UID, 'CODE_VALUE': self.rng.choice(self.lookup_values)})
+            for base_num in range(self.scale.baselines):
+                rows['baselines'].append({
+                    'SiteId': SITE_ID, 'PROJ_UID': proj_uid, 'TB_BASE_NUM': base_num, 'TASK_UID': task_uid,
+                    'CREATED_DATE': START + timedelta(days=30 * base_num),
+                    'TB_BASE_START': start, 'TB_BASE_FINISH': finish})
+        return rows
+
+    def project_rows(self) -> Iterable[Dict[str, List[Dict]]]:
+        """ По проекту за раз: в памяти не держится все зеркало """
+
+        for i in range(self.scale.projects):
+            proj_uid = self.uuid()
+            rows = self.task_rows(proj_uid, self.scale.tasks)
+            rows['projects'] = [{'SiteId': SITE_ID, 'PROJ_UID': proj_uid, 'PROJ_NAME': f'Project {i}',
+                                 'PROJ_INFO_START_DATE': START, 'PROJ_INFO_FINISH_DATE': START + timedelta(days=455)}]
+            yield rows
+
+
+def mirror_tables(metadata: MetaData) -> Dict[str, Table]:
+    def table(model):
+        return metadata.tables[f'{MSSQL_SCHEMA}.{model.__tablename__}']
+
+    return {
+        'projects': table(MspProjects),
+        'tasks': table(MspTasks),
+        'custom_fields': table(MspTaskCustomFieldsValues),
+        'lookup': table(MspLookupTableValues),
+        'baselines': table(MspTaskBaselines),
+    }
+
+
+async def insert_rows(connection, table: Table, rows: List[Dict]) -> int:
+    for chunk in chunked(rows):
+        await connection.execute(insert(table), chunk)
+    return len(rows)
+
+
+async def populate(engine, scale: FixtureScale) -> Dict[str, int]:
+    """ Пересоздает зеркало MSSQL и заполняет его; возвращает число строк по таблицам """
+
+    metadata = mirror_metadata()
+    tables = mirror_tables(metadata)
+    generator = FixtureGenerator(scale)
+    counts = dict.fromkeys(tables, 0)
+    async with engine.begin() as connection:
+        await connection.execute(text(f'CREATE SCHEMA IF NOT EXISTS {MSSQL_SCHEMA}'))
+        await connection.run_sync(metadata.drop_all)
+        await connection.run_sync(metadata.create_all)
+        counts['lookup'] += await insert_rows(connection, tables['lookup'], generator.lookup_rows())
+        for rows in generator.project_rows():
+            for name, table_rows in rows.items():
+                counts[name] += await insert_rows(connection, tables[name], table_rows)
+    return counts
+
+
+async def mutate(engine, scale: FixtureScale, fraction: float = 0.1, new_tasks: int = 2) -> int:
+    """
+    Изменения для инкрементальной миграции: у доли проектов сдвигаются даты тасок
+    и появляются новые таски. Возвращает число измененных проектов
+    """
+
+    tables = mirror_tables(mirror_metadata())
+    generator = FixtureGenerator(FixtureScale(**{**scale.__dict__, 'seed': scale.seed + 1}))
+    async with engine.begin() as connection:
+        entry = await connection.execute(select(tables['projects'].c.PROJ_UID))
+        proj_uids = [str(proj_uid) for proj_uid in entry.scalars().all()]
+        changed = generator.rng.sample(proj_uids, max(1, int(len(proj_uids) * fraction))) if proj_uids else []
+        if not changed:
+            return 0
+        tasks = tables['tasks']
+        await connection.execute(
+            update(tasks)
+            .where(tasks.c.PROJ_UID.in_(changed))
+            .values(TASK_START_DATE=tasks.c.TASK_START_DATE + timedelta(days=1),
+                    TASK_FINISH_DATE=tasks.c.TASK_FINISH_DATE + timedelta(days=1)))
+        for proj_uid in changed:
+            rows = generator.task_rows(proj_uid, new_tasks, offset=scale.tasks)
+            for name in ('tasks', 'custom_fields'):
+                await insert_rows(connection, tables[name], rows[name])
+    return len(changed)
+
+
+def add_scale_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = FixtureScale()
+    parser.add_argument('--dsn', required=True, help='postgresql+asyncpg://... отдельной базы для бенчмарка')
+    parser.add_argument('--projects', type=int, default=defaults.projects)
+    parser.add_argument('--tasks', type=int, default=defaults.tasks, help='тасок в проекте')
+    parser.add_argument('--baselines', type=int, default=defaults.baselines, help='базовых планов в проекте')
+    parser.add_argument('--key-date-ratio', type=float, default=defaults.key_date_ratio)
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+
+
+def scale_from_args(args) -> FixtureScale:
+    return FixtureScale(projects=args.projects, tasks=args.tasks, baselines=args.baselines,
+                        key_date_ratio=args.key_date_ratio, seed=args.seed)
+
+
+async def main(args) -> None:
+    engine = create_async_engine(args.dsn)
+    try:
+        counts = await populate(engine, scale_from_args(args))
+    finally:
+        await engine.dispose()
+    for name, count in counts.items():
+        print(f'{name:<14} {count:>12} rows')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    add_scale_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,68 @@
+""" Стоимость копирования строки MspTasks -> KeyDates: рефлексивный set_attr против скомпилированного маппера
+
+    python -m benchmarks.mappers [rows]
+"""
+import asyncio
+import inspect
+import sys
+from datetime import datetime
+from timeit import default_timer
+from uuid import uuid4
+
+from app.model.models import MspTasks, MspTaskCustomFieldsValues, MspLookupTableValues, KeyDates
+from app.services.mappers import key_date_mapper
+
+
+async def reflective_set_attr(model, obj):
+    """ Прежний способ: обход obj.__dir__() и await obj.map(attr) на каждый атрибут """
+    dst = model()
+    for attr in obj.__dir__():
+        mapped = await obj.map(attr)
+        if mapped:
+            dst_attr, value = mapped
+            if inspect.isawaitable(value):
+                value = await value
+            setattr(dst, dst_attr, value)
+    return dst
+
+
+def make_tasks(rows: int) -> list:
+    now = datetime.now()
+    return [
+        MspTasks(task_uid=str(uuid4()), task_name=f'task {i}', task_start_date=now, task_finish_date=now,
+                 custom_plan=MspTaskCustomFieldsValues(key_dates=MspLookupTableValues(lt_value_text='КД')))
+        for i in range(rows)
+    ]
+
+
+def report(name: str, rows: int, seconds: float) -> None:
+    print(f'{name:<28} {seconds * 1e6 / rows:10.2f} us/row {rows / seconds:14.0f} rows/s')
+
+
+async def main(rows: int) -> None:
+    tasks = make_tasks(rows)
+    tuples = [tuple(getattr(task, attr) for attr in key_date_mapper.src_attrs) for task in tasks]
+
+    started = default_timer()
+    for task in tasks:
+        await reflective_set_attr(KeyDates, task)
+    report('reflective set_attr', rows, default_timer() - started)
+
+    started = default_timer()
+    for task in tasks:
+        key_date_mapper.create(task)
+    report('compiled mapper -> model', rows, default_timer() - started)
+
+    started = default_timer()
+    for task in tasks:
+        key_date_mapper.to_dict(task)
+    report('compiled mapper -> dict', rows, default_timer() - started)
+
+    started = default_timer()
+    for row in tuples:
+        key_date_mapper.from_row(row)
+    report('compiled mapper row tuple', rows, default_timer() - started)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000))
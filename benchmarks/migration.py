@@ -0,0 +1,147 @@
+""" Сквозной бенчмарк миграции на синтетическом зеркале MSSQL: первая загрузка и инкрементальный прогон
+
+    python -m benchmarks.migration --dsn postgresql+asyncpg://... [--mode bulk|parallel|orm]
+                                   [--projects N] [--tasks N] [--baselines N] [--key-date-ratio R]
+                                   [--changed-fraction F] [--trace-memory] [--json result.json]
+
+Целевые таблицы и зеркало в базе --dsn пересоздаются. По каждому прогону печатаются
+записанные строки в секунду, число SQL-запросов и пиковая память
+"""
+import argparse
+import asyncio
+import json
+import resource
+import tracemalloc
+from dataclasses import dataclass, asdict
+from timeit import default_timer
+from typing import List
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from app.model.models import Base
+from app.schema.migration import MigrationParams, MIGRATION_CHUNK_SIZE
+from app.services.migration_services import (migrate_data, migrate_data_bulk, migrate_data_parallel,
+                                             MigrationProgress)
+from benchmarks.fixtures import MSSQL_SCHEMA, add_scale_arguments, scale_from_args, populate, mutate
+
+MIGRATIONS = {
+    'bulk': migrate_data_bulk,
+    'parallel': migrate_data_parallel,
+    'orm': migrate_data,
+}
+
+
+@dataclass
+class RunResult:
+    phase: str
+    mode: str
+    projects: int
+    rows_written: int
+    seconds: float
+    rows_per_second: float
+    statements: int
+    peak_rss_mb: float
+    peak_heap_mb: float = None  # только с --trace-memory: tracemalloc замедляет прогон
+
+
+class StatementCounter:
+    """ Число запросов к БД через engine; executemany считается одним запросом """
+
+    def __init__(self, engine):
+        self.engine = engine.sync_engine
+        self.count = 0
+
+    def __call__(self, *args) -> None:
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        event.remove(self.engine, 'before_cursor_execute', self)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss в Linux - в килобайтах; пик процесса, не сбрасывается между прогонами
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def reset_target_tables(engine) -> None:
+    tables = [table for table in Base.metadata.sorted_tables if table.schema != MSSQL_SCHEMA]
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all, tables=tables)
+        await connection.run_sync(Base.metadata.create_all, tables=tables)
+
+
+async def run_migration(engine, phase: str, mode: str, params: MigrationParams, trace_memory: bool) -> RunResult:
+    progress = MigrationProgress()
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        with StatementCounter(engine) as statements:
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                started = default_timer()
+                await MIGRATIONS[mode](db, params, progress)
+                seconds = default_timer() - started
+        peak_heap = tracemalloc.get_traced_memory()[1] / 2 ** 20 if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return RunResult(
+        phase=phase,
+        mode=mode,
+        projects=progress.projects_done,
+        rows_written=progress.rows_written,
+        seconds=seconds,
+        rows_per_second=progress.rows_written / seconds if seconds else 0,
+        statements=statements.count,
+        peak_rss_mb=peak_rss_mb(),
+        peak_heap_mb=peak_heap,
+    )
+
+
+def report(result: RunResult) -> None:
+    heap = f'{result.peak_heap_mb:8.1f} MB heap' if result.peak_heap_mb is not None else ''
+    print(f'{result.phase:<12} {result.mode:<9} {result.projects:>7} projects {result.rows_written:>10} rows '
+          f'{result.seconds:8.2f} s {result.rows_per_second:10.0f} rows/s {result.statements:>8} statements '
+          f'{result.peak_rss_mb:8.1f} MB rss {heap}')
+
+
+async def main(args) -> List[RunResult]:
+    engine = create_async_engine(args.dsn)
+    scale = scale_from_args(args)
+    params = dict(bulk=args.mode == 'bulk', parallel=args.mode == 'parallel', stream=args.stream,
+                  chunk_size=args.chunk_size)
+    results = []
+    try:
+        await populate(engine, scale)
+        await reset_target_tables(engine)
+        # первая загрузка пишет и отметки проектов, чтобы следующий прогон был инкрементальным
+        results.append(await run_migration(engine, 'first-load', args.mode,
+                                           MigrationParams(**params, incremental=True), args.trace_memory))
+        report(results[-1])
+        await mutate(engine, scale, args.changed_fraction)
+        results.append(await run_migration(engine, 'incremental', args.mode,
+                                           MigrationParams(**params, incremental=True), args.trace_memory))
+        report(results[-1])
+    finally:
+        await engine.dispose()
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'scale': asdict(scale), 'results': [asdict(result) for result in results]}, file, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    add_scale_arguments(parser)
+    parser.add_argument('--mode', choices=list(MIGRATIONS), default='bulk')
+    parser.add_argument('--stream', action='store_true')
+    parser.add_argument('--chunk-size', type=int, default=MIGRATION_CHUNK_SIZE)
+    parser.add_argument('--changed-fraction', type=float, default=0.1,
+                        help='доля проектов, измененных перед инкрементальным прогоном')
+    parser.add_argument('--trace-memory', action='store_true')
+    parser.add_argument('--json', help='файл для результатов в JSON')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,52 @@
+""" Стоимость запроса чтения при разных режимах кэша prepared statements
+
+    python -m benchmarks.statements [project_id] [queries]
+
+Запросы - те же, что строят /baselines/ (базовые планы, версии, ключевые даты проекта).
+Для честного сравнения с PgBouncer DSN в db_settings должен указывать на PgBouncer;
+режим pgbouncer требует PgBouncer >= 1.21 с max_prepared_statements > 0
+"""
+import asyncio
+import sys
+from statistics import median, quantiles
+from timeit import default_timer
+
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from app.database import StatementCacheMode, build_connect_args
+from app.repositories.base_line_repositories import BaseLinesRepository
+from app.schema.baselines import BaseLinesExpand
+from app.settings import db_settings
+
+
+def report(name: str, timings: list) -> None:
+    p95 = quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+    print(f'{name:<12} {median(timings) * 1e3:8.2f} ms p50 {p95 * 1e3:8.2f} ms p95 '
+          f'{len(timings) / sum(timings):8.0f} req/s')
+
+
+async def run(mode: StatementCacheMode, project_id: int, queries: int) -> list:
+    engine = create_async_engine(db_settings.dsn, connect_args=build_connect_args(db_settings, mode),
+                                 pool_size=1, max_overflow=0)
+    timings = []
+    try:
+        # каждый запрос - отдельная транзакция, как при transaction pooling;
+        # первый прогревает соединение и кэши и в отчет не идет
+        for _ in range(queries + 1):
+            async with AsyncSession(engine) as db:
+                started = default_timer()
+                await BaseLinesRepository(db).get_base_plans_rows(project_id, BaseLinesExpand.full)
+                timings.append(default_timer() - started)
+    finally:
+        await engine.dispose()
+    return timings[1:]
+
+
+async def main(project_id: int, queries: int) -> None:
+    for mode in (StatementCacheMode.unique, StatementCacheMode.pgbouncer):
+        report(mode.value, await run(mode, project_id, queries))
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 1000))
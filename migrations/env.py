@@ -0,0 +1,46 @@
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import build_connect_args
+from app.model.models import Base
+from app.settings import db_settings
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def include_object(obj, name, type_, reflected, compare_to) -> bool:
+    """ Схема mssql - зеркало таблиц MSSQL, ее структурой миграции не управляют """
+    return getattr(obj, 'schema', None) != 'mssql'
+
+
+def run_migrations_offline() -> None:
+    context.configure(url=db_settings.dsn, target_metadata=target_metadata, include_object=include_object,
+                      literal_binds=True, dialect_opts={'paramstyle': 'named'})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online() -> None:
+    engine = create_async_engine(db_settings.dsn, connect_args=build_connect_args(db_settings))
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
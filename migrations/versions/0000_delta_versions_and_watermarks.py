@@ -0,0 +1,46 @@
+"""Delta versions and migration watermarks
+
+Таблицы project, base_plan, version и key_dates уже существуют - это исходная схема сервиса.
+Ревизия создает migration_watermark (отметки инкрементальной миграции по проектам)
+и колонки version.is_delta, key_dates.is_removed. Колонки добавляются NOT NULL со значением по умолчанию false: Postgres заполняет им
+существующие строки, а до появления дельта-версий все версии полные и ключевые даты не удалены
+
+Revision ID: 0000
+Revises:
+Create Date: 2026-10-18 00:00:00
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = '0000'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    ('version', 'is_delta'),
+    ('key_dates', 'is_removed'),
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        'migration_watermark',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('project_uuid', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('last_created_date', sa.DateTime(), nullable=True),
+        sa.Column('content_hash', sa.String(32), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id'),
+        sa.UniqueConstraint('project_uuid'),
+    )
+    for table, column in COLUMNS:
+        op.add_column(table, sa.Column(column, sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    for table, column in reversed(COLUMNS):
+        op.drop_column(table, column)
+    op.drop_table('migration_watermark')
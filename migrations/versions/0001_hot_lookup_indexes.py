@@ -0,0 +1,43 @@
+"""Indexes for hot lookup columns
+
+Таблицы project, base_plan, version и key_dates - исходная схема сервиса,
+migration_watermark и колонки дельта-версий создает ревизия 0000: эта добавляет только индексы.
+Индексы строятся CONCURRENTLY, без блокировки записи, поэтому каждый - вне транзакции миграции
+
+Revision ID: 0001
+Revises: 0000
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+
+revision = '0001'
+down_revision = '0000'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_key_dates_version_id', 'key_dates', ['version_id']),
+    ('ix_key_dates_base_plan_id', 'key_dates', ['base_plan_id']),
+    ('ix_key_dates_task_uuid', 'key_dates', ['task_uuid']),
+    ('ix_key_dates_project_id_updated_at', 'key_dates', ['project_id', 'updated_at']),
+    ('ix_version_project_id_id', 'version', ['project_id', 'id']),
+    ('ix_version_base_plan_id_id', 'version', ['base_plan_id', 'id']),
+)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+        # уникальный индекс строится без блокировки, затем становится ограничением
+        op.create_index('uq_base_plan_project_id_base_number', 'base_plan', ['project_id', 'base_number'],
+                        unique=True, postgresql_concurrently=True, if_not_exists=True)
+    op.execute('ALTER TABLE base_plan ADD CONSTRAINT uq_base_plan_project_id_base_number '
+               'UNIQUE USING INDEX uq_base_plan_project_id_base_number')
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_base_plan_project_id_base_number', 'base_plan', type_='unique')
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,37 @@
+"""Current version pointers for project and base plan
+
+project.current_version_id и base_plan.current_version_id - последняя версия,
+их переставляет миграция данных. Для уже мигрированных данных указатели
+заполняются максимальным id версии
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+TABLES = ('project', 'base_plan')
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column('current_version_id', sa.Integer(), nullable=True))
+        op.create_foreign_key(f'fk_{table}_current_version_id', table, 'version', ['current_version_id'], ['id'])
+    op.execute('UPDATE project SET current_version_id = v.version_id '
+               'FROM (SELECT project_id, max(id) AS version_id FROM version GROUP BY project_id) v '
+               'WHERE v.project_id = project.id')
+    op.execute('UPDATE base_plan SET current_version_id = v.version_id '
+               'FROM (SELECT base_plan_id, max(id) AS version_id FROM version GROUP BY base_plan_id) v '
+               'WHERE v.base_plan_id = base_plan.id')
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_constraint(f'fk_{table}_current_version_id', table, type_='foreignkey')
+        op.drop_column(table, 'current_version_id')